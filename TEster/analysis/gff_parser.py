@@ -1,5 +1,15 @@
 import csv
+import glob
 import os
+import numpy as np
+
+# permitted deviation of element borders relative to the element length
+RELATIVE_DEVIATION = 0.07
+
+# GFF3 path of every generated sequence: its modification time and te_base intervals,
+# parsed once per process and inherited copy-on-write by forked ones
+_ground_truth = {}
+
 
 class ElementCounter:
     """
@@ -12,6 +22,107 @@ class ElementCounter:
         self.false_negatives = 0
 
 
+class IntervalIndex:
+    """
+    Beginning and end sites of GFF features held in read-only arrays
+    sorted by the beginning site
+    """
+
+    def __init__(self, starts, ends):
+        """
+        Parameters
+        ----------
+        starts : list
+            beginning sites of the features
+        ends : list
+            end sites of the features
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        order = np.argsort(starts, kind="stable")
+
+        self.starts = starts[order]
+        self.ends = ends[order]
+        self.starts.flags.writeable = False
+        self.ends.flags.writeable = False
+
+    def __len__(self):
+        return len(self.starts)
+
+
+class StreamingScorer:
+    """
+    Scores the nested_repeat features of a GFF3 file while TE-nester is
+    still writing it. Every complete line is parsed once and the counts
+    are kept up to date against the te_base intervals of the generated sequence
+    """
+
+    def __init__(self, generated):
+        """
+        Parameters
+        ----------
+        generated : IntervalIndex
+            te_base intervals produced by TE-generator
+        """
+        self.generated = generated
+        self.element_counter = ElementCounter()
+        # generated elements matched by a detected one so far
+        self.found = np.zeros(len(generated), dtype=bool)
+        self.incomplete_line = ""
+
+    def feed(self, text):
+        """
+        Scores the complete lines of the text appended to the file
+
+        Parameters
+        ----------
+        text : str
+            text appended since the last call
+        """
+        lines = (self.incomplete_line + text).split("\n")
+        self.incomplete_line = lines.pop()
+
+        detected = load_intervals(lines, "nested_repeat")
+        if len(detected) == 0:
+            return
+
+        find_false_positives(self.generated, detected, self.element_counter)
+        self.found |= count_matches(self.generated, detected) > 0
+
+    def finish(self):
+        """
+        Scores the last line of a file not ending with a line break
+        """
+        self.feed("\n")
+
+    def counts(self):
+        """
+        Returns
+        -------
+        tuple
+            (TP, FP, FN, accuracy) of the features scored so far
+        """
+        false_negatives = int(np.count_nonzero(~self.found))
+        return (self.element_counter.true_positives, self.element_counter.false_positives, false_negatives,
+                calculate_accuracy(self.element_counter.true_positives, self.element_counter.false_positives,
+                                   false_negatives))
+
+    def optimistic_accuracy(self):
+        """
+        Estimates the accuracy the run can still reach. This is a heuristic
+        and not a bound: true positives count the matching (detected, generated)
+        pairs, so output written later can raise the accuracy above it
+
+        Returns
+        -------
+        float
+            accuracy reached if every generated element not found yet was
+            still detected once without any further false positive
+        """
+        true_positives = self.element_counter.true_positives + int(np.count_nonzero(~self.found))
+        return calculate_accuracy(true_positives, self.element_counter.false_positives, 0)
+
+
 def get_gff_path(path):
     """
     Solves the issues emerging from the unknown
@@ -29,11 +140,46 @@ def get_gff_path(path):
         full path to the gff file present in the
 
     """
-    sequence_name = os.listdir(path + "/")[0]
+    sequence_name = sorted(os.listdir(path + "/"))[0]
     gff_file_name = "{}_genome_browser.gff".format(sequence_name)
     return "{}/{}/{}".format(path, sequence_name, gff_file_name)
 
 
+def list_generated_sequences(generated_path):
+    """
+    Finds all the sequences of a generated test set
+
+    Parameters
+    ----------
+    generated_path : str
+        path to the directory of the generated test set
+
+    Returns
+    -------
+    list
+        sorted paths to the directories of the single generated sequences
+    """
+    sequence_files = glob.glob(os.path.join(generated_path, "**", "TEster_generated.fa"), recursive=True)
+    return sorted("{}/".format(os.path.dirname(path)) for path in sequence_files)
+
+
+def get_generated_gff_path(sequence_path):
+    """
+    Finds the GFF3 file with the elements inserted into a generated sequence
+
+    Parameters
+    ----------
+    sequence_path : str
+        path to the directory of a single generated sequence
+
+    Returns
+    -------
+    str
+        path to the GFF3 file produced by TE-generator
+    """
+    return sorted(glob.glob("{}data/GENERATED_*/GENERATED_*.gff".format(sequence_path)))[0]
+
+
 def calculate_accuracy(true_positives, false_positives, false_negatives):
     """
     Calculates the accuracy with emphasis on false positives
@@ -65,100 +211,131 @@ def calculate_accuracy(true_positives, false_positives, false_negatives):
     return 0
 
 
-def find_false_positives(generated_gff, nester_gff, element_counter):
+def load_intervals(gff, feature):
     """
-    Detects number of true and false positives in the resulting .gff file
-    from nester compared to the one provided by generator
+    Parses the features of the given type from a GFF3 file
 
     Parameters
     ----------
-    generated_gff : TextIOWrapper
-        GFF3 file produced by TE-generator
-    nester_gff : TextIOWrapper
-        GFF3 file produced by TE-nester
-    element_counter : ElementCounter
-        Object to load the detected counts into
+    gff : TextIOWrapper
+        GFF3 file to parse, or any iterable of its lines
+    feature : str
+        type of the features to load, te_base or nested_repeat
+
+    Returns
+    -------
+    IntervalIndex
+        positions of all the features of the given type
     """
+    starts = []
+    ends = []
 
-    for line in nester_gff:
-        TP_detected = False
-        # if at beginning, empty line or not a TE base
-        if len(line) > 0 and line[0] != "#" and line.split()[2] == "nested_repeat":
-            generated_gff.seek(0)
+    for line in gff:
+        # if at beginning, empty line or not the requested feature
+        if len(line) > 0 and line[0] != "#":
             split_line = line.split()
+            if len(split_line) > 4 and split_line[2] == feature:
+                starts.append(int(split_line[3]))
+                ends.append(int(split_line[4]))
 
-            # beginning and end sites ofdetected TEs
-            ltr_base = int(split_line[3])
-            ltr_end = int(split_line[4])
+    return IntervalIndex(starts, ends)
 
-            relative_deviation = (ltr_end - ltr_base) * 0.07
 
-            # for each line of TE-nester detected transposons, parse all generated TEs
-            for generated_line in generated_gff:
-
-                generated_split = generated_line.split()
-
-                # if at beginning, empty line or not a TE base
-                if len(generated_line) > 0 and generated_line[0] != "#" and generated_split[2] == "te_base":
+def load_ground_truth(sequence_path):
+    """
+    Returns the te_base intervals of a generated sequence, parsing its
+    GFF3 file only the first time and again only if it is rewritten
 
-                    # beginning and end sites of generated TEs
-                    base = int(generated_split[3])
-                    end = int(generated_split[4])
+    Parameters
+    ----------
+    sequence_path : str
+        path to the directory of a single generated sequence
 
-                    # detect if found TE is true or false positive
-                    if abs(base - ltr_base) <= relative_deviation and abs(end - ltr_end) <= relative_deviation:
-                        element_counter.true_positives += 1
-                        TP_detected = True
+    Returns
+    -------
+    IntervalIndex
+        positions of the generated elements, shared by all the callers
+    """
+    gff_path = get_generated_gff_path(sequence_path)
+    modified = os.stat(gff_path).st_mtime_ns
 
-            # if no true positives were detected
-            if not TP_detected:
-                element_counter.false_positives += 1
+    if gff_path not in _ground_truth or _ground_truth[gff_path][0] != modified:
+        with open(gff_path, "r") as gff:
+            _ground_truth[gff_path] = modified, load_intervals(gff, "te_base")
+    return _ground_truth[gff_path][1]
 
 
-def find_false_negatives(generated_gff, nester_gff, element_counter):
+def count_matches(query, target):
     """
-    Detects number of false negatives in the resulting .gff file
-    from generator compared to the one created by nester
+    Counts for every query interval the target intervals whose beginning
+    and end sites both lie within 7% of the query interval's length
 
     Parameters
     ----------
-    generated_gff : TextIOWrapper
-        GFF3 file produced by TE-generator
-    nester_gff : TextIOWrapper
-        GFF3 file produced by TE-nester
-    element_counter : ElementCounter
-        Object to load the detected counts into
+    query : IntervalIndex
+        intervals to find matches for
+    target : IntervalIndex
+        intervals searched for matches
+
+    Returns
+    -------
+    numpy.ndarray
+        number of matching target intervals for each query interval
     """
-    generated_gff.seek(0)
+    deviation = (query.ends - query.starts) * RELATIVE_DEVIATION
 
-    for gen_line in generated_gff:
-        is_false_negative = True
+    # range of target intervals with a matching beginning site
+    low = np.searchsorted(target.starts, query.starts - deviation, side="left")
+    high = np.searchsorted(target.starts, query.starts + deviation, side="right")
+    candidates = np.maximum(high - low, 0)
 
-        if len(gen_line) > 0 and gen_line[0] != "#" and gen_line.split()[2] == "te_base":
-            nester_gff.seek(0)
+    # expands the ranges into (query, target) pairs and checks the end sites
+    query_positions = np.repeat(np.arange(len(query)), candidates)
+    offsets = np.arange(len(query_positions)) - np.repeat(np.cumsum(candidates) - candidates, candidates)
+    target_positions = low[query_positions] + offsets
 
-            split_gen_row = gen_line.split()
+    matching = np.abs(target.ends[target_positions] - query.ends[query_positions]) <= deviation[query_positions]
 
-            # beginning and end sites ofdetected TEs
-            gen_base = int(split_gen_row[3])
-            gen_end = int(split_gen_row[4])
+    return np.bincount(query_positions[matching], minlength=len(query))
 
-            # the permitted deviation from the actual position of the LTR
-            relative_deviation = (gen_end - gen_base) * 0.07
 
-            for nester_line in nester_gff:
-                split_nester_row = nester_line.split()
+def find_false_positives(generated, detected, element_counter):
+    """
+    Detects number of true and false positives in the resulting .gff file
+    from nester compared to the one provided by generator
+
+    Parameters
+    ----------
+    generated : IntervalIndex
+        te_base intervals produced by TE-generator
+    detected : IntervalIndex
+        nested_repeat intervals produced by TE-nester
+    element_counter : ElementCounter
+        Object to load the detected counts into
+    """
+    matches = count_matches(detected, generated)
+
+    element_counter.true_positives += int(matches.sum())
+    element_counter.false_positives += int(np.count_nonzero(matches == 0))
+
 
-                if len(nester_line) > 0 and nester_line[0] != "#" and split_nester_row[2] == "nested_repeat":
-                    nest_base = int(split_nester_row[3])
-                    nest_end = int(split_nester_row[4])
+def find_false_negatives(generated, detected, element_counter):
+    """
+    Detects number of false negatives in the resulting .gff file
+    from generator compared to the one created by nester
 
-                    # detect if found TE is true or false positive
-                    if abs(nest_base - gen_base) <= relative_deviation and abs(nest_end - gen_end) <= relative_deviation:
-                        is_false_negative = False
+    Parameters
+    ----------
+    generated : IntervalIndex
+        te_base intervals produced by TE-generator
+    detected : IntervalIndex
+        nested_repeat intervals produced by TE-nester
+    element_counter : ElementCounter
+        Object to load the detected counts into
+    """
+    matches = count_matches(generated, detected)
 
-            if is_false_negative:
-                element_counter.false_negatives += 1
+    element_counter.false_negatives += int(np.count_nonzero(matches == 0))
 
 
 def get_accuracy(generated_gff, nester_gff, parameter="", out_csv=None):
@@ -191,11 +368,16 @@ def get_accuracy(generated_gff, nester_gff, parameter="", out_csv=None):
     """
 
     nester_gff.seek(0)
+    generated_gff.seek(0)
     element_counter = ElementCounter()
 
-    find_false_positives(generated_gff, nester_gff, element_counter)
+    # each file is parsed only once
+    generated = load_intervals(generated_gff, "te_base")
+    detected = load_intervals(nester_gff, "nested_repeat")
+
+    find_false_positives(generated, detected, element_counter)
 
-    find_false_negatives(generated_gff, nester_gff, element_counter)
+    find_false_negatives(generated, detected, element_counter)
 
     accuracy = calculate_accuracy(element_counter.true_positives,
                                   element_counter.false_positives,
@@ -0,0 +1,70 @@
+import json
+import sqlite3
+from TEster.utils.tester_utils import file_hash
+
+
+class ResultCache:
+    """
+    Persistent store of the results obtained for configurations on a generated
+    sequence, so that repeated parameter vectors do not run nested-nester again
+    """
+
+    def __init__(self, cache_path, sequence_files, tool):
+        """
+        Parameters
+        ----------
+        cache_path : str
+            path to the SQLite file holding the results
+        sequence_files : list
+            paths to the generated sequences the results belong to
+        tool : str
+            recognition tool used by nested-nester
+        """
+        self.sequence = ":".join(file_hash(path) for path in sequence_files)
+        self.tool = tool
+        self.connection = sqlite3.connect(cache_path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS results ("
+                                "sequence TEXT, tool TEXT, parameters TEXT, "
+                                "true_positives INTEGER, false_positives INTEGER, "
+                                "false_negatives INTEGER, accuracy REAL, "
+                                "PRIMARY KEY (sequence, tool, parameters))")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.connection.close()
+
+    def get(self, values):
+        """
+        Looks up the result of a configuration
+
+        Parameters
+        ----------
+        values : dict
+            dictionary mapping parameter names to values
+
+        Returns
+        -------
+        tuple
+            (TP, FP, FN, accuracy) or None if the configuration was not evaluated yet
+        """
+        row = self.connection.execute("SELECT true_positives, false_positives, false_negatives, accuracy "
+                                      "FROM results WHERE sequence = ? AND tool = ? AND parameters = ?",
+                                      (self.sequence, self.tool, json.dumps(values, sort_keys=True))).fetchone()
+        return tuple(row) if row is not None else None
+
+    def put(self, values, result):
+        """
+        Stores the result of a configuration
+
+        Parameters
+        ----------
+        values : dict
+            dictionary mapping parameter names to values
+        result : tuple
+            (TP, FP, FN, accuracy) obtained for the configuration
+        """
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                    (self.sequence, self.tool, json.dumps(values, sort_keys=True)) + tuple(result))
@@ -0,0 +1,195 @@
+import numpy as np
+
+# number of rows allocated for an empty table
+INITIAL_CAPACITY = 64
+
+# columns following the parameters, named like in the counts csv file
+RESULT_COLUMNS = ("Accuracy", "False Positives", "False Negatives", "Fidelity", "Stopped")
+
+# fidelity of results scored on the whole test sequences rather than on chunks of them
+FULL_FIDELITY = 1.0
+
+# accuracy recorded for configurations whose nester run failed or exceeded the limits
+PENALTY_ACCURACY = -1.0
+
+
+class ResultsTable:
+    """
+    Columnar store of the configurations evaluated in a run together with
+    their results, kept in a numpy structured array that grows by doubling.
+    The fidelity of a result is the fraction of the test sequences it was
+    scored on and a stopped result counts the output of a run stopped early,
+    only full results that were not stopped are comparable with each other
+    """
+
+    def __init__(self, param_names, data=None):
+        """
+        Parameters
+        ----------
+        param_names : list
+            names of the parameters in the order of the columns
+        data : numpy.ndarray
+            initial rows of the table, None for an empty table
+        """
+        self.param_names = list(param_names)
+        self.dtype = np.dtype([(name, np.float64 if name == "M" else np.int64) for name in self.param_names] +
+                              [(column, np.float64 if column in ("Accuracy", "Fidelity") else np.int64)
+                               for column in RESULT_COLUMNS])
+
+        if data is None:
+            self._data = np.zeros(INITIAL_CAPACITY, dtype=self.dtype)
+            self._size = 0
+        else:
+            self._data = np.array(data, dtype=self.dtype)
+            self._size = len(self._data)
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, column):
+        """
+        Parameters
+        ----------
+        column : str
+            name of a parameter or of a result column
+
+        Returns
+        -------
+        numpy.ndarray
+            read-only view of the column
+        """
+        view = self._data[column][:self._size]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def data(self):
+        """
+        numpy.ndarray
+            structured array holding the rows of the table
+        """
+        return self._data[:self._size]
+
+    def append(self, values, accuracy, false_positives, false_negatives, fidelity=FULL_FIDELITY, stopped=False):
+        """
+        Adds the result of a configuration
+
+        Parameters
+        ----------
+        values : dict
+            dictionary mapping parameter names to values
+        accuracy : float
+            accuracy obtained for the configuration
+        false_positives : int
+            number of false positive elements
+        false_negatives : int
+            number of false negative elements
+        fidelity : float
+            fraction of the test sequences the result was scored on
+        stopped : bool
+            True if the run was stopped early and the result counts its output so far
+        """
+        if self._size == len(self._data):
+            self._data = np.resize(self._data, max(2 * len(self._data), INITIAL_CAPACITY))
+
+        self._data[self._size] = tuple(values[name] for name in self.param_names) + \
+            (accuracy, false_positives, false_negatives, fidelity, int(stopped))
+        self._size += 1
+
+    def rows(self, start=0):
+        """
+        Parameters
+        ----------
+        start : int
+            index of the first row
+
+        Returns
+        -------
+        generator
+            rows from start on as lists of python values, in the order of the csv columns
+        """
+        for row in self._data[start:self._size].tolist():
+            yield list(row)
+
+    def configurations(self):
+        """
+        Returns
+        -------
+        list
+            dictionaries mapping parameter names to the values of every row
+        """
+        return [dict(zip(self.param_names, row)) for row in self.data[self.param_names].tolist()]
+
+    def scored(self):
+        """
+        Returns
+        -------
+        numpy.ndarray
+            mask of the results scored on the whole test sequences whose nester runs
+            neither failed nor were stopped early
+        """
+        return (self["Accuracy"] != PENALTY_ACCURACY) & (self["Fidelity"] == FULL_FIDELITY) & (self["Stopped"] == 0)
+
+    def completed(self):
+        """
+        Returns
+        -------
+        ResultsTable
+            results of the configurations whose nester runs on the whole
+            test sequences neither failed nor were stopped early
+        """
+        return ResultsTable(self.param_names, self.data[self.scored()])
+
+    def split(self, threshold):
+        """
+        Splits the completed results into good and bad ones
+
+        Parameters
+        ----------
+        threshold : float
+            results with accuracy above it are good
+
+        Returns
+        -------
+        ResultsTable
+            good results
+        ResultsTable
+            bad results
+        """
+        completed = self.scored()
+        good = np.round(self["Accuracy"], 3) > threshold
+        return ResultsTable(self.param_names, self.data[completed & good]), \
+            ResultsTable(self.param_names, self.data[completed & ~good])
+
+    def best(self):
+        """
+        Returns
+        -------
+        dict
+            configuration with the highest accuracy on the whole test
+            sequences, or on chunks or from stopped runs if no configuration
+            got that far
+        """
+        full = (self["Fidelity"] == FULL_FIDELITY) & (self["Stopped"] == 0)
+        accuracy = np.where(full, self["Accuracy"], -np.inf) if full.any() else self["Accuracy"]
+        row = self.data[np.argmax(accuracy)]
+        return {name: row[name].item() for name in self.param_names}
+
+    def top(self, count):
+        """
+        Parameters
+        ----------
+        count : int
+            number of configurations to keep
+
+        Returns
+        -------
+        ResultsTable
+            the best result of each of the count most accurate distinct
+            configurations completed on the whole test sequences, from
+            the most accurate one
+        """
+        order = np.flatnonzero(self.scored())
+        order = order[np.argsort(-self["Accuracy"][order], kind="stable")]
+        _, first = np.unique(self.data[self.param_names][order], return_index=True)
+        return ResultsTable(self.param_names, self.data[order[np.sort(first)[:count]]])
@@ -0,0 +1,159 @@
+import csv
+import numpy as np
+from numpy.lib import recfunctions
+from scipy import stats
+
+# kernel evaluations held in memory at once by weighted_kdes
+KDE_BLOCK_SIZE = 1 << 22
+
+
+def ks_statistics(first, second):
+    """
+    Computes the two-sample Kolmogorov-Smirnov statistic of every column
+    of two samples at once
+
+    Parameters
+    ----------
+    first : numpy.ndarray
+        first sample, one column per variable
+    second : numpy.ndarray
+        second sample with the same columns
+
+    Returns
+    -------
+    numpy.ndarray
+        statistic of every column, nan if one of the samples is empty
+    """
+    first = np.asarray(first, dtype=np.float64)
+    second = np.asarray(second, dtype=np.float64)
+    if len(first) == 0 or len(second) == 0:
+        return np.full(first.shape[1], np.nan)
+
+    combined = np.concatenate((first, second))
+    order = np.argsort(combined, axis=0, kind="stable")
+    sorted_values = np.take_along_axis(combined, order, axis=0)
+
+    # difference of the empirical distribution functions after every value
+    difference = np.cumsum(np.where(order < len(first), 1 / len(first), -1 / len(second)), axis=0)
+
+    # among tied values only the last one is a point of both functions
+    last = np.ones(sorted_values.shape, dtype=bool)
+    last[:-1] = sorted_values[1:] != sorted_values[:-1]
+
+    return np.abs(np.where(last, difference, 0)).max(axis=0)
+
+
+def weighted_kdes(values, weights, grids):
+    """
+    Evaluates the weighted Gaussian kernel density estimate of every column
+    on its own grid at once, with the bandwidth given by Scott's rule like
+    scipy.stats.gaussian_kde
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        sample, one column per variable
+    weights : numpy.ndarray
+        weight of every row of the sample
+    grids : list
+        values to evaluate the estimate of every column at
+
+    Returns
+    -------
+    list
+        density of every column on its grid
+    """
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    weights = weights / weights.sum()
+    squared = np.sum(weights ** 2)
+
+    # weighted unbiased variance scaled by the squared Scott's factor of the effective sample size
+    mean = weights @ values
+    variance = weights @ (values - mean) ** 2 / (1 - squared)
+    bandwidth = np.sqrt(variance) * squared ** (1 / 5)
+
+    lengths = [len(grid) for grid in grids]
+    points = np.concatenate([np.asarray(grid, dtype=np.float64) for grid in grids])
+    columns = np.repeat(np.arange(len(grids)), lengths)
+    densities = np.empty(len(points))
+
+    step = max(1, KDE_BLOCK_SIZE // len(values))
+    for start in range(0, len(points), step):
+        block = slice(start, start + step)
+        width = bandwidth[columns[block]]
+        kernels = np.exp(-0.5 * ((points[block] - values[:, columns[block]]) / width) ** 2)
+        densities[block] = weights @ kernels / (width * np.sqrt(2 * np.pi))
+
+    return np.split(densities, np.cumsum(lengths)[:-1])
+
+
+def parameter_sensitivity(good, bad):
+    """
+    Ranks the parameters by how much their good and bad values differ
+
+    Parameters
+    ----------
+    good : ResultsTable
+        results above the mean
+    bad : ResultsTable
+        results below the mean
+
+    Returns
+    -------
+    list
+        (parameter, KS statistic, p-value, good mean, bad mean) tuples
+        from the most sensitive parameter
+    """
+    names = good.param_names
+    good_values = recfunctions.structured_to_unstructured(good.data[names], dtype=np.float64)
+    bad_values = recfunctions.structured_to_unstructured(bad.data[names], dtype=np.float64)
+
+    statistics = ks_statistics(good_values, bad_values)
+    if len(good) and len(bad):
+        p_values = stats.kstwo.sf(statistics, np.round(len(good) * len(bad) / (len(good) + len(bad))))
+        good_means = good_values.mean(axis=0)
+        bad_means = bad_values.mean(axis=0)
+    else:
+        p_values = good_means = bad_means = np.full(len(names), np.nan)
+
+    order = np.argsort(-np.nan_to_num(statistics, nan=-1), kind="stable")
+    return [(names[i], statistics[i], p_values[i], good_means[i], bad_means[i]) for i in order]
+
+
+def write_sensitivity(path, sensitivity):
+    """
+    Writes the ranking of the parameters
+
+    Parameters
+    ----------
+    path : str
+        path to the csv file
+    sensitivity : list
+        ranking created by parameter_sensitivity
+    """
+    with open(path, "w") as csv_file:
+        outcsv = csv.writer(csv_file, delimiter=',', quotechar='|', quoting=csv.QUOTE_MINIMAL)
+        outcsv.writerow(("Rank", "Parameter", "KS Statistic", "P-value", "Good Mean", "Bad Mean"))
+        for rank, (name, statistic, p_value, good_mean, bad_mean) in enumerate(sensitivity, 1):
+            outcsv.writerow((rank, name, round(statistic, 4), "{:.3g}".format(p_value),
+                             round(good_mean, 3), round(bad_mean, 3)))
+
+
+def write_frozen_parameters(path, parameters):
+    """
+    Writes the parameters fixed at a single value and the run they were frozen in
+
+    Parameters
+    ----------
+    path : str
+        path to the csv file
+    parameters : list
+        list of Parameter objects
+    """
+    with open(path, "w") as csv_file:
+        outcsv = csv.writer(csv_file, delimiter=',', quotechar='|', quoting=csv.QUOTE_MINIMAL)
+        outcsv.writerow(("Parameter", "Value", "Run"))
+        for param in sorted(parameters, key=lambda param: param.frozen_run or 0):
+            if param.frozen_run is not None:
+                outcsv.writerow((param.name, param.convert(param.values[0]), param.frozen_run))
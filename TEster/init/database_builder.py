@@ -0,0 +1,126 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from Bio.Seq import Seq
+from TEster.utils.fasta import IndexedFasta
+
+# buffer size of the written database
+WRITE_BUFFER = 1 << 20
+
+
+def extract_sequence(transposon, fasta, number):
+    """
+    Extracts the transposon from the mapped file of its record
+
+    Parameters
+    ----------
+    transposon : nested.core.te.TE
+        the transposon to extract
+    fasta : IndexedFasta
+        the query sequence file
+    number : int
+        number of the record the transposon was found in
+
+    Returns
+    -------
+        string that represents the transposon
+    """
+    return fasta.fetch(number, transposon.location[0], transposon.location[1])
+
+
+def extract_elements(task) -> list:
+    """
+    Annotates a single record and extracts all the found elements
+
+    Parameters
+    ----------
+    task : tuple
+        annotation function, path to the query sequence file and number
+        of the record
+
+    Returns
+    -------
+    list
+        sequences of the elements in the order they were found
+    """
+    annotate, input_file, number = task
+
+    with IndexedFasta(input_file) as fasta:
+        transposons = annotate(fasta.names[number], Seq(fasta.fetch(number)))
+        return [extract_sequence(t, fasta, number)
+                for transposon in transposons
+                for t in transposon]
+
+
+def annotated_records(input_file, annotate, jobs):
+    """
+    Streams the records of the input file through a pool of jobs processes,
+    keeping at most two records per process in flight. Only record numbers
+    are sent to the processes, which read the records from the mapped file
+
+    Parameters
+    ----------
+    input_file : str
+        query sequence file
+    annotate : function
+        module level function returning the transposons of a record
+    jobs : int
+        number of records annotated at once
+
+    Yields
+    ------
+    tuple
+        record id and its element sequences, in the order of the input file
+    """
+    with IndexedFasta(input_file) as fasta:
+        names = fasta.names
+
+    if jobs == 1:
+        for number, record_id in enumerate(names):
+            yield record_id, extract_elements((annotate, input_file, number))
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=get_context("fork")) as pool:
+        in_flight = deque()
+        for number, record_id in enumerate(names):
+            in_flight.append((record_id, pool.submit(extract_elements, (annotate, input_file, number))))
+            if len(in_flight) >= 2 * jobs:
+                record_id, future = in_flight.popleft()
+                yield record_id, future.result()
+
+        while in_flight:
+            record_id, future = in_flight.popleft()
+            yield record_id, future.result()
+
+
+def build_ltr_database(input_file, database_path, annotate, jobs=1):
+    """
+    Creates a database of LTRs from the elements the annotation function
+    finds in the records of the input file. Elements are numbered in the
+    order of the records regardless of the number of processes
+
+    Parameters
+    ----------
+    input_file : str
+        query sequence file
+    database_path : str
+        path and name of the database to be created
+    annotate : function
+        module level function returning the transposons of a record
+    jobs : int
+        number of records annotated at once
+
+    Returns
+    -------
+    the same database_path for convenience
+    """
+    seq_count = 0
+    with open(database_path, "w+", buffering=WRITE_BUFFER) as out_fasta:
+        for record_id, elements in annotated_records(input_file, annotate, jobs):
+            lines = []
+            for element in elements:
+                seq_count += 1
+                lines.append(">{} {}\n{}\n".format(record_id, seq_count, element))
+            out_fasta.write("".join(lines))
+
+    return database_path
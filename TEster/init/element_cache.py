@@ -0,0 +1,86 @@
+import hashlib
+import json
+import sqlite3
+
+# annotations written between two commits of the cache
+COMMIT_INTERVAL = 256
+
+
+class ElementCache:
+    """
+    Persistent store of the transposons TE-nester finds in single database
+    elements, so that profiling a database again only annotates the elements
+    that are new or changed since the last time
+    """
+
+    def __init__(self, cache_path):
+        """
+        Parameters
+        ----------
+        cache_path : str
+            path to the SQLite file holding the annotations
+        """
+        self.connection = sqlite3.connect(cache_path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS elements (element TEXT PRIMARY KEY, transposons TEXT)")
+        self.uncommitted = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.connection.commit()
+        self.connection.close()
+
+    @staticmethod
+    def key(sequence, settings):
+        """
+        Creates the key of an element
+
+        Parameters
+        ----------
+        sequence : bytes
+            sequence of the element
+        settings : str
+            ltr_finder settings the element is annotated with
+
+        Returns
+        -------
+        str
+            hexadecimal key of the element
+        """
+        return hashlib.sha256(settings.encode() + b"\0" + sequence).hexdigest()
+
+    def get(self, key):
+        """
+        Looks up the annotation of an element
+
+        Parameters
+        ----------
+        key : str
+            key created by ElementCache.key
+
+        Returns
+        -------
+        list
+            (score, signals) of every transposon found in the element,
+            or None if the element was not annotated yet
+        """
+        row = self.connection.execute("SELECT transposons FROM elements WHERE element = ?", (key,)).fetchone()
+        return [tuple(transposon) for transposon in json.loads(row[0])] if row is not None else None
+
+    def put(self, key, transposons):
+        """
+        Stores the annotation of an element
+
+        Parameters
+        ----------
+        key : str
+            key created by ElementCache.key
+        transposons : list
+            (score, signals) of every transposon found in the element
+        """
+        self.connection.execute("INSERT OR REPLACE INTO elements VALUES (?, ?)", (key, json.dumps(transposons)))
+        self.uncommitted += 1
+        if self.uncommitted >= COMMIT_INTERVAL:
+            self.connection.commit()
+            self.uncommitted = 0
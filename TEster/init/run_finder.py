@@ -1,27 +1,28 @@
-from Bio import SeqIO
 import os
 from nested.core.te import TE
+from TEster.init.database_builder import build_ltr_database
+from TEster.utils.tester_utils import file_hash
 
 
-def extract_sequence(transposon, record):
+def annotate_record(record_id, sequence):
     """
-    Extracts the transposon from the BioPython record
+    Runs LTR finder through TE-nester on a single record
 
     Parameters
     ----------
-    transposon : nested.core.te.TE
-        the transposon to extract
-    record : Bio.SeqIO.SeqRecord
-        the sequence to extract from
+    record_id : str
+        id of the record
+    sequence : Bio.Seq.Seq
+        sequence of the record
 
     Returns
     -------
-        string that represents the transposon
+    transposons found in the record
     """
-    return record.seq[transposon.location[0]:transposon.location[1]]
+    return TE.run(record_id, sequence)
 
 
-def create_ltr_database(input_file, database_path):
+def create_ltr_database(input_file, database_path, jobs=1):
     """
     Uses parse_ltr_table from TE-nester to extract transposons from ltr_finder
     output and create a database of LTRs
@@ -32,26 +33,17 @@ def create_ltr_database(input_file, database_path):
         query sequence file
     database_path : str
         path and name of the database to be created
+    jobs : int
+        number of records annotated at once
 
     Returns
     -------
     the same database_path for convenience
     """
+    return build_ltr_database(input_file, database_path, annotate_record, jobs)
 
-    seq_count = 0
-    with open(database_path, "w+") as out_fasta:
-        records = SeqIO.parse(input_file, "fasta")
-        for record in records:
-            transposons = TE.run(record.id, record.seq)
-            for transposon in transposons:
-                for t in transposon:
-                    seq_count += 1
-                    out_fasta.write(">{} {}\n".format(record.id, seq_count))
-                    out_fasta.write("{}\n".format(extract_sequence(t, record)))
-    return database_path
 
-
-def run_finder(input_file):
+def run_finder(input_file, jobs=1, cache=None):
     """
     Creates a file for the LTR finder output and calls the parsing function
     on it
@@ -60,14 +52,23 @@ def run_finder(input_file):
     ----------
     input_file : str
         path to the query file
+    jobs : int
+        number of records annotated at once
+    cache : ArtifactCache
+        cache of databases created for previous queries
 
     Returns
     -------
     path to created TE database file
     """
 
-    path = "/tmp/TEster/LTR_finder/"
+    path = "/tmp/TEster/LTR_finder/{}/".format(os.getpid())
     os.makedirs(path, exist_ok=True)
     database_path = "{}artificial_database.fa".format(path)
 
-    return create_ltr_database(input_file, database_path)
+    if cache is None:
+        return create_ltr_database(input_file, database_path, jobs)
+
+    key = cache.key("database", "ltr_finder", file_hash(input_file))
+    return cache.get_or_create(key, lambda: create_ltr_database(input_file, database_path, jobs),
+                               "artificial_database.fa")
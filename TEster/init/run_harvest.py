@@ -1,28 +1,23 @@
 import os
-from Bio import SeqIO
-import subprocess
-from nested.core.te_harvest import TE_harvest 
+from nested.core.te_harvest import TE_harvest
+from TEster.init.database_builder import build_ltr_database
+from TEster.utils.tester_utils import file_hash
 
 
-def extract_sequence(transposon, record):
-    """
-    Extracts the transposon from the BioPython record
-
-    Parameters
-    ----------
-    transposon : nested.core.te.TE
-        the transposon to extract
-    record : Bio.SeqIO.SeqRecord
-        the sequence to extract from
-
-    Returns
-    -------
-        string that represents the transposon
+def annotate_record(record_id, sequence):
+    """ Runs LTR_harvest through TE-nester on a single record
+
+    Args:
+        record_id str: id of the record
+        sequence Bio.Seq.Seq: sequence of the record
+
+    Returns:
+        transposons found in the record
     """
-    return record.seq[transposon.location[0]:transposon.location[1]]
+    return TE_harvest.run(record_id, sequence)
 
 
-def create_ltr_database(input_file, database_path):
+def create_ltr_database(input_file, database_path, jobs=1):
     """
     Uses the static method of the TE_harvest class from TE-nester to extract transposons from the input sequence
     and create a database of LTRs
@@ -30,34 +25,32 @@ def create_ltr_database(input_file, database_path):
     Args:
         input_file str: input fasta file name
         database_path str: path where database is to be created 
+        jobs int: number of records annotated at once
 
     Returns:
         str : path to database
     """
-    with open(database_path, "w+") as out_fasta:
-        records = SeqIO.parse(input_file, "fasta")
-        for record in records:
-            transposons = TE_harvest.run(record.id, record.seq)
-            for transposon in transposons:
-                for t in transposon:
-                    seq_count += 1
-                    out_fasta.write(">{} {}\n".format(record.id, seq_count))
-                    out_fasta.write("{}\n".format(extract_sequence(t, record)))
-    return database_path
-    
-
-
-def run_harvest(input_file):
+    return build_ltr_database(input_file, database_path, annotate_record, jobs)
+
+
+def run_harvest(input_file, jobs=1, cache=None):
     """ Runs LTR_harvest on input sequence and extracts transposon sequences
 
     Args:
         input_file str: input fasta file path
+        jobs int: number of records annotated at once
+        cache ArtifactCache: cache of databases created for previous queries
 
     Returns:
         str : path to database
     """
-    path = "/tmp/TEster/LTRHarvest"
+    path = "/tmp/TEster/LTRHarvest/{}/".format(os.getpid())
     os.makedirs(path, exist_ok=True)
     database_path = "{}artificial_database.fa".format(path)
 
-    return create_ltr_database(input_file, database_path)
\ No newline at end of file
+    if cache is None:
+        return create_ltr_database(input_file, database_path, jobs)
+
+    key = cache.key("database", "ltr_harvest", file_hash(input_file))
+    return cache.get_or_create(key, lambda: create_ltr_database(input_file, database_path, jobs),
+                               "artificial_database.fa")
@@ -1,7 +1,32 @@
-import subprocess
-from Bio import SeqIO
-import pyfastx
+import json
+import os
+import shutil
+import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from multiprocessing import get_context
+from Bio.Seq import Seq
 from nested.core.te import TE
+from TEster.init.element_cache import ElementCache
+from TEster.utils.fasta import IndexedFasta
+from TEster.utils.profiling import run_process
+from TEster.utils.tester_utils import file_hash, load_config
+
+# sequences of every session are generated into a directory named by its process id
+GENERATED_PATH = "/tmp/TEster/generated_data"
+
+# fresh sequences the final candidates are compared on
+VALIDATION_PATH = "/tmp/TEster/validation_data"
+
+# upper limit of the generated sequence length
+MAX_SEQUENCE_LENGTH = 1000000
+
+# annotations of the database elements, kept next to the artifact cache entries
+ELEMENT_CACHE_FILE = "element_profiles.sqlite"
+
+# database mapped by the process annotating the elements
+_database = None
 
 
 class EmptyInputFileException(Exception):
@@ -17,9 +42,10 @@ class Element:
     Contains info about the average element in the input database
     parameters in the analysis will be set according to the information
     obtained from Element
+    self.scores = ltr_finder scores of the transposons found in the database
     """
 
-    def __init__(self, input_db, length):
+    def __init__(self, input_db, length, jobs=1, cache=None):
         """
         Parameters
         ----------
@@ -27,11 +53,15 @@ class Element:
             the database to get info from
         length : int
             length of the average element
+        jobs : int
+            number of elements annotated at once
+        cache : ArtifactCache
+            cache whose directory keeps the annotations of earlier sessions
         """
         self.length = length
-        self.score, self.site_presence = self.get_average_info(input_db)
+        self.score, self.site_presence = self.get_average_info(input_db, jobs, cache)
 
-    def get_average_info(self, input_db):
+    def get_average_info(self, input_db, jobs=1, cache=None):
         """
         Obtains info using TE-nester's run_ltr_finder
 
@@ -39,37 +69,233 @@ class Element:
         ----------
         input_db : str
             input database of elements
+        jobs : int
+            number of elements annotated at once
+        cache : ArtifactCache
+            cache whose directory keeps the annotations of earlier sessions
+
+        Returns
+        -------
+        float
+            average score of the transposons
+        float
+            share of the transposons with at least two of PBS, PPT and TSR
         """
-        te_count = 0
-        site_presence = 0
-        score = 0
-
-        records = SeqIO.parse(input_db, "fasta")
-        for record in records:
-            TEs = TE.run(record.id, record.seq)
-            at_least_two = 0
-            for TE in TEs:
-                te_count += 1
-                if TE.score is not None:
-                    score += TE.score
-                if "nan" not in TE.ppt:
-                    at_least_two += 1
-                if "nan" not in TE.pbs:
-                    at_least_two += 1
-                if "nan" not in TE.tsr_left:
-                    at_least_two += 1
-                if at_least_two >= 2:
-                    site_presence += 1
-        if te_count > 0:
-            return score/te_count, site_presence/te_count
+        transposons = profile_database(input_db, jobs, cache)
+        self.scores = np.array([score for score, _ in transposons if score is not None], dtype=float)
+
+        if len(transposons) > 0:
+            site_presence = sum(1 for _, signals in transposons if signals >= 2)
+            return self.scores.sum() / len(transposons), site_presence / len(transposons)
         return 0, 0
 
 
-def sequence_generator(input_file, input_db, percentage):
+def open_database(input_db):
+    """
+    Maps the database for the annotations of the current process
+
+    Parameters
+    ----------
+    input_db : str
+        input database of elements
+    """
+    global _database
+    _database = IndexedFasta(input_db)
+
+
+def profile_element(number) -> list:
+    """
+    Runs LTR finder through TE-nester on a single element of the mapped database
+
+    Parameters
+    ----------
+    number : int
+        number of the element in the database
+
+    Returns
+    -------
+    list
+        (score, signals) of every transposon found in the element, signals
+        being the number of PBS, PPT and TSR found
+    """
+    transposons = TE.run(_database.names[number], Seq(_database.fetch(number)))
+    return [(transposon.score, sum("nan" not in signal
+                                   for signal in (transposon.ppt, transposon.pbs, transposon.tsr_left)))
+            for transposon in transposons]
+
+
+def annotate_elements(input_db, elements, jobs):
+    """
+    Streams the elements through a pool of jobs processes, keeping at most
+    two elements per process in flight
+
+    Parameters
+    ----------
+    input_db : str
+        input database of elements
+    elements : iterable
+        numbers of the elements to annotate along with their cache keys
+    jobs : int
+        number of elements annotated at once
+
+    Yields
+    ------
+    tuple
+        cache key of the element and its transposons
+    """
+    if jobs == 1:
+        open_database(input_db)
+        try:
+            for number, key in elements:
+                yield key, profile_element(number)
+        finally:
+            _database.close()
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=get_context("fork"),
+                             initializer=open_database, initargs=(input_db,)) as pool:
+        in_flight = deque()
+        for number, key in elements:
+            in_flight.append((key, pool.submit(profile_element, number)))
+            if len(in_flight) >= 2 * jobs:
+                key, future = in_flight.popleft()
+                yield key, future.result()
+
+        while in_flight:
+            key, future = in_flight.popleft()
+            yield key, future.result()
+
+
+def profile_database(input_db, jobs=1, cache=None) -> list:
+    """
+    Annotates every element of the database with TE-nester. Annotations
+    are stored by the element sequence and the ltr_finder settings, so
+    elements annotated in earlier sessions are not annotated again
+
+    Parameters
+    ----------
+    input_db : str
+        input database of elements
+    jobs : int
+        number of elements annotated at once
+    cache : ArtifactCache
+        cache whose directory keeps the annotations, None keeps none
+
+    Returns
+    -------
+    list
+        (score, signals) of every transposon found in the database
+    """
+    settings = json.dumps(load_config()["ltr"], sort_keys=True)
+    transposons = []
+
+    def missing_elements(fasta, store):
+        for number in range(len(fasta)):
+            key = ElementCache.key(fasta.region(number).translate(None, b"\r\n"), settings)
+            cached = store.get(key) if store is not None else None
+            if cached is None:
+                yield number, key
+            else:
+                transposons.extend(cached)
+
+    annotated = 0
+    with IndexedFasta(input_db) as fasta, \
+            ElementCache(os.path.join(cache.path, ELEMENT_CACHE_FILE)) if cache is not None else nullcontext() as store:
+        for key, found in annotate_elements(input_db, missing_elements(fasta, store), jobs):
+            annotated += 1
+            transposons.extend(found)
+            if store is not None:
+                store.put(key, found)
+        print("Annotated {} of {} database elements".format(annotated, len(fasta)))
+
+    return transposons
+
+
+def average_length(path):
+    """
+    Parameters
+    ----------
+    path : str
+        path to a FASTA file
+
+    Returns
+    -------
+    int
+        average length of the records, read from the index of the file
+    """
+    with IndexedFasta(path) as fasta:
+        if len(fasta) == 0 or fasta.lengths.sum() == 0:
+            raise EmptyInputFileException(path)
+        return round(fasta.lengths.mean())
+
+
+def generation_settings(input_file, input_db, percentage):
+    """
+    Calculates the average lengths of the transposons to be given to generator
+    and the average sequence length in the query file
+
+    Parameters
+    ----------
+    input_file : str
+        query sequence file path
+    input_db : str
+        input database file path
+    percentage : int
+        percentage of TE content
+
+    Returns
+    -------
+    int
+        length of the average element
+    int
+        length of the generated sequences
+    int
+        number of elements inserted into a generated sequence
+    """
+    avg_element_length = average_length(input_db)
+
+    # sequences are at most 1Mbp long for shorter run time
+    avg_sequence_length = min(average_length(input_file), MAX_SEQUENCE_LENGTH)
+
+    iterations = max(1, round((avg_sequence_length / avg_element_length) * (percentage/100)))
+    return avg_element_length, avg_sequence_length, iterations
+
+
+def generate_sequences(input_db, length, iterations, sequences, path):
+    """
+    Generates independent sequences with TE-generator into sequence_<number>
+    directories, replacing whatever the directory held before
+
+    Parameters
+    ----------
+    input_db : str
+        input database file path
+    length : int
+        length of the generated sequences
+    iterations : int
+        number of elements inserted into a sequence
+    sequences : int
+        number of sequences to generate
+    path : str
+        directory of the generated sequences
+
+    Returns
+    -------
+    the same path for convenience
+    """
+    # leftovers of earlier sessions would be cached with the new sequences
+    shutil.rmtree(path, ignore_errors=True)
+    for number in range(1, sequences + 1):
+        run_process(['nested-generator', '-l', str(length), '-i', str(iterations),
+                     '-d', "{}sequence_{}".format(path, number), input_db, "TEster_generated.fa"])
+    return path
+
+
+def sequence_generator(input_file, input_db, percentage, cache=None, sequences=1, jobs=1, profile=True):
     """
     Calculates the average lengths of the transposons to be given to generator
     and the average sequence length in the query file, then generates
-    a corresponding sequence
+    the given number of independent corresponding sequences
 
     Parameters
     ----------
@@ -77,27 +303,63 @@ def sequence_generator(input_file, input_db, percentage):
         query sequence file path
     input_db : str
         input database file path
+    percentage : int
+        percentage of TE content
+    cache : ArtifactCache
+        cache of sequences generated in previous sessions
+    sequences : int
+        number of sequences to generate
+    jobs : int
+        number of database elements profiled at once
+    profile : bool
+        False skips profiling the database elements for tools whose
+        parameters are not steered by them
 
     Returns
     -------
     element : Element
-        inof about the average element
+        inof about the average element, None if it was not profiled
     path to generated file : str
 
     """
-    avg_element_length = round(pyfastx.Fasta(input_db).mean)
+    avg_element_length, avg_sequence_length, iterations = generation_settings(input_file, input_db, percentage)
+
+    element = None
+    if profile:
+        print("Analysing properties of elements in database")
+        element = Element(input_db, avg_element_length, jobs, cache)
 
-    # set this to 1Mbp for shorter run time
-    avg_sequence_length = 1000000
+    def generate():
+        return generate_sequences(input_db, avg_sequence_length, iterations, sequences,
+                                  "{}/{}/".format(GENERATED_PATH, os.getpid()))
 
-    # avg_sequence_length = round(pyfastx.Fasta(input_file).mean)
-    #print("Analysing properties of elements in database")
-    #element = Element(input_db, avg_element_length)
+    if cache is None:
+        return element, generate()
 
-    iterations = round((avg_sequence_length / avg_element_length) * (percentage/100))
+    key = cache.key("generated", file_hash(input_db), avg_sequence_length, iterations, percentage, sequences)
+    return element, "{}/".format(cache.get_or_create(key, generate))
 
-    subprocess.run(['nested-generator', '-l', str(avg_sequence_length), '-i',
-                    str(iterations), '-d', "/tmp/TEster",
-                    input_db, "TEster_generated.fa"])
 
-    return "/tmp/TEster/generated_data/"
+def generate_validation_set(input_file, input_db, percentage, sequences=1):
+    """
+    Generates fresh sequences with the settings of the test set, which are
+    never cached so that the final candidates are scored on unseen data
+
+    Parameters
+    ----------
+    input_file : str
+        query sequence file path
+    input_db : str
+        input database file path
+    percentage : int
+        percentage of TE content
+    sequences : int
+        number of sequences to generate
+
+    Returns
+    -------
+    path to the generated sequences : str
+    """
+    _, avg_sequence_length, iterations = generation_settings(input_file, input_db, percentage)
+    return generate_sequences(input_db, avg_sequence_length, iterations, sequences,
+                              "{}/{}/".format(VALIDATION_PATH, os.getpid()))
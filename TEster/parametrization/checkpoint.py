@@ -0,0 +1,87 @@
+import os
+import pickle
+from numpy import random
+from TEster.analysis.results_table import ResultsTable
+
+
+class Checkpoint:
+    """
+    State of the search saved after every batch of iterations so that an
+    interrupted session can continue where it stopped.
+    self.results = results of the iterations completed in the current run
+    """
+
+    def __init__(self, path, generated_path, run_number, parameters, strategy):
+        """
+        Parameters
+        ----------
+        path : str
+            path to the checkpoint file
+        generated_path : str
+            path to the generated sequence directory the session runs on
+        run_number : int
+            run the state belongs to
+        parameters : list
+            list of Parameter objects with their current distributions
+        strategy : SearchStrategy
+            strategy choosing the configurations
+        """
+        self.path = path
+        self.generated_path = generated_path
+        self.run_number = run_number
+        self.parameters = parameters
+        self.strategy = strategy
+        self.results = ResultsTable([param.name for param in parameters])
+        self.random_state = None
+
+    def save(self):
+        """
+        Writes the checkpoint together with the state of the random generator,
+        replacing the previous one atomically
+        """
+        self.random_state = random.get_state()
+
+        with open("{}.tmp".format(self.path), "wb") as checkpoint_file:
+            pickle.dump(self, checkpoint_file)
+
+        os.replace("{}.tmp".format(self.path), self.path)
+
+
+def checkpoint_path(out_dir):
+    """
+    Parameters
+    ----------
+    out_dir : str
+        path to the analysis output directory
+
+    Returns
+    -------
+    str
+        path to the checkpoint file of the session
+    """
+    return "{}/checkpoint.pkl".format(out_dir)
+
+
+def load_checkpoint(out_dir):
+    """
+    Loads the checkpoint of the session and restores the random generator
+
+    Parameters
+    ----------
+    out_dir : str
+        path to the analysis output directory
+
+    Returns
+    -------
+    Checkpoint
+        the saved state or None if there is no checkpoint
+    """
+    path = checkpoint_path(out_dir)
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "rb") as checkpoint_file:
+        checkpoint = pickle.load(checkpoint_file)
+
+    random.set_state(checkpoint.random_state)
+    return checkpoint
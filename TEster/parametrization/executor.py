@@ -0,0 +1,337 @@
+import asyncio
+import os
+import shutil
+import TEster.utils.tester_utils as tester_utils
+from TEster.analysis.gff_parser import StreamingScorer, calculate_accuracy, get_gff_path, load_ground_truth
+from TEster.analysis.results_table import PENALTY_ACCURACY
+from TEster.utils.profiling import profiler, run_process_async
+
+WORKERS_PATH = "/tmp/TEster/workers"
+
+# result of a configuration whose nested-nester run failed or exceeded the limits
+FAILED_RESULT = (0, 0, 0, PENALTY_ACCURACY, False)
+
+# seconds between two reads of the GFF3 file nested-nester is writing
+TAIL_INTERVAL = 0.5
+
+
+class GffTail:
+    """
+    Feeds what nested-nester appended to its GFF3 output since the
+    last read to a StreamingScorer
+    """
+
+    def __init__(self, results_dir, scorer):
+        """
+        Parameters
+        ----------
+        results_dir : str
+            output directory of the nested-nester run
+        scorer : StreamingScorer
+            scorer of the output
+        """
+        self.data_dir = "{}/data/".format(results_dir)
+        self.scorer = scorer
+        self.file = None
+
+    def read(self, required=False):
+        """
+        Parameters
+        ----------
+        required : bool
+            raise if nested-nester has not created the file, which is
+            only expected once it has exited
+        """
+        if self.file is None:
+            if not required and (not os.path.isdir(self.data_dir) or not os.listdir(self.data_dir)):
+                return
+            path = get_gff_path(self.data_dir)
+            if not required and not os.path.exists(path):
+                return
+            self.file = open(path, "r")
+
+        self.scorer.feed(self.file.read())
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+async def evaluate_configuration(task, work_dir, timeout=None, memory_limit=None, stop_below=None) \
+        -> (int, int, int, float, bool):
+    """
+    Runs nested-nester with a single configuration on a single generated
+    sequence inside a working directory and scores its output while it is
+    being written. Runs that exceed the limits or fail count as failed with
+    the penalty accuracy
+
+    Parameters
+    ----------
+    task : tuple
+        configuration values dictionary, path to the directory of the
+        generated sequence and the recognition tool used
+    work_dir : str
+        directory owned by this run for its config file and nester output
+    timeout : float
+        wall time limit of nested-nester in seconds, None for no limit
+    memory_limit : int
+        address space limit of nested-nester in bytes, None for no limit
+    stop_below : float
+        stops the run once the optimistic accuracy of its output falls below
+        this accuracy and returns the counts of the output written so far,
+        None never stops it
+
+    Returns
+    -------
+    int
+        number of true positives
+    int
+        number of false positives
+    int
+        number of false negatives
+    float
+        accuracy of the configuration
+    bool
+        True if the run was stopped early and the counts are incomplete
+    """
+    values, sequence_path, tool = task
+
+    home_dir = "{}/home".format(work_dir)
+    results_dir = "{}/nester_results".format(work_dir)
+
+    with profiler.timer("config"):
+        tester_utils.write_config(values, home_dir)
+        env = tester_utils.nester_environment(home_dir)
+        # output of a killed run must not be scored in the next one
+        shutil.rmtree(results_dir, ignore_errors=True)
+
+    with profiler.timer("scoring"):
+        scorer = StreamingScorer(load_ground_truth(sequence_path))
+    tail = GffTail(results_dir, scorer)
+    stop = asyncio.Event()
+
+    async def follow_output():
+        while True:
+            await asyncio.sleep(TAIL_INTERVAL)
+            tail.read()
+            if stop_below is not None and scorer.optimistic_accuracy() < stop_below:
+                stop.set()
+                return
+
+    generated_file = "{}TEster_generated.fa".format(sequence_path)
+    follower = asyncio.ensure_future(follow_output())
+    try:
+        with profiler.timer("nester"):
+            returncode = await run_process_async(["nested-nester", "-d", results_dir, "-dt", tool, generated_file],
+                                                 env, timeout, memory_limit, stop)
+        profiler.count("nester_runs")
+    finally:
+        follower.cancel()
+
+    try:
+        if stop.is_set():
+            profiler.count("stopped_runs")
+            return scorer.counts() + (True,)
+
+        if returncode != 0:
+            profiler.count("failed_runs")
+            return FAILED_RESULT
+
+        with profiler.timer("scoring"):
+            tail.read(required=True)
+            scorer.finish()
+            return scorer.counts() + (False,)
+    finally:
+        tail.close()
+
+
+def profiled_evaluation(task, run_number=None, timeout=None, memory_limit=None, stop_below=None):
+    """
+    Evaluates a configuration in a worker process and returns the
+    worker's profiling records along with the result
+
+    Parameters
+    ----------
+    task : tuple
+        task of evaluate_configuration
+    run_number : int
+        run the evaluation is counted in, None keeps the current one
+    timeout : float
+        wall time limit of nested-nester in seconds, None for no limit
+    memory_limit : int
+        address space limit of nested-nester in bytes, None for no limit
+    stop_below : float
+        accuracy the run is stopped below, None never stops it
+
+    Returns
+    -------
+    tuple
+        result of evaluate_configuration
+    dict
+        profiling records of the evaluation
+    """
+    profiler.reset()
+    if run_number is not None:
+        profiler.run_number = run_number
+    work_dir = "{}/{}".format(WORKERS_PATH, os.getpid())
+    result = asyncio.run(evaluate_configuration(task, work_dir, timeout, memory_limit, stop_below))
+    return result, profiler.snapshot()
+
+
+class Executor:
+    """
+    Runs evaluate_configuration tasks, keeping its workers between batches
+    until it is closed
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def run(self, tasks, stop_below=None):
+        """
+        Evaluates the tasks
+
+        Parameters
+        ----------
+        tasks : list
+            tasks of evaluate_configuration
+        stop_below : float
+            runs are stopped once their optimistic accuracy falls below this accuracy, None never stops them
+
+        Returns
+        -------
+        list
+            (TP, FP, FN, accuracy, stopped) tuples in the order of the tasks
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Stops the workers
+        """
+
+
+class LocalExecutor(Executor):
+    """
+    Runs the tasks as concurrent nested-nester processes of the current
+    process, each in the working directory of one of the jobs slots
+    """
+
+    def __init__(self, jobs=1, timeout=None, memory_limit=None):
+        """
+        Parameters
+        ----------
+        jobs : int
+            number of nested-nester runs executed at once
+        timeout : float
+            wall time limit of a run in seconds, None for no limit
+        memory_limit : int
+            address space limit of a run in bytes, None for no limit
+        """
+        self.jobs = jobs
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+
+    def run(self, tasks, stop_below=None):
+        # a single job can run on a system-wide config rewritten before every run
+        if self.jobs > 1:
+            tester_utils.require_config_isolation()
+        return asyncio.run(self.run_tasks(tasks, stop_below))
+
+    async def run_tasks(self, tasks, stop_below=None):
+        """
+        Evaluates the tasks, at most jobs of them at once
+
+        Parameters
+        ----------
+        tasks : list
+            tasks of evaluate_configuration
+        stop_below : float
+            runs are stopped once their optimistic accuracy falls below this accuracy, None never stops them
+
+        Returns
+        -------
+        list
+            (TP, FP, FN, accuracy, stopped) tuples in the order of the tasks
+        """
+        slots = asyncio.Queue()
+        for slot in range(self.jobs):
+            slots.put_nowait(slot)
+
+        async def run_task(task):
+            slot = await slots.get()
+            try:
+                work_dir = "{}/{}_{}".format(WORKERS_PATH, os.getpid(), slot)
+                return await evaluate_configuration(task, work_dir, self.timeout, self.memory_limit, stop_below)
+            finally:
+                slots.put_nowait(slot)
+
+        return await asyncio.gather(*(run_task(task) for task in tasks))
+
+
+def run_configurations(configurations, sequence_paths, tool, executor, stop_below=None) -> list:
+    """
+    Evaluates the configurations on every generated sequence with the
+    executor. The counts of all sequences are summed into a single
+    accuracy per configuration
+
+    Parameters
+    ----------
+    configurations : list
+        list of dictionaries mapping parameter names to values
+    sequence_paths : list
+        paths to the directories of the generated sequences
+    tool : str
+        recognition tool used by nested-nester
+    executor : Executor
+        runs the nested-nester evaluations
+    stop_below : float
+        runs are stopped once their optimistic accuracy falls below this
+        accuracy, None never stops them. Only a single sequence is stopped
+        early since the estimate of one sequence says nothing about the
+        sum of several
+
+    Returns
+    -------
+    list
+        (TP, FP, FN, accuracy, stopped) tuples in the order of the configurations
+    """
+    tasks = [(values, sequence_path, tool) for values in configurations for sequence_path in sequence_paths]
+    if len(sequence_paths) != 1:
+        stop_below = None
+    counts = executor.run(tasks, stop_below) if tasks else []
+
+    return [aggregate_counts(counts[i:i + len(sequence_paths)])
+            for i in range(0, len(counts), len(sequence_paths))]
+
+
+def aggregate_counts(counts) -> (int, int, int, float, bool):
+    """
+    Sums the counts obtained on several sequences and calculates
+    the accuracy from the sums. A configuration failing on any of
+    the sequences fails as a whole
+
+    Parameters
+    ----------
+    counts : list
+        (TP, FP, FN, accuracy, stopped) tuples of the single sequences
+
+    Returns
+    -------
+    tuple
+        (TP, FP, FN, accuracy, stopped) of all the sequences together,
+        stopped if the run on any of them was stopped early
+    """
+    if any(count[3] == PENALTY_ACCURACY for count in counts):
+        return FAILED_RESULT
+
+    true_positives = sum(count[0] for count in counts)
+    false_positives = sum(count[1] for count in counts)
+    false_negatives = sum(count[2] for count in counts)
+
+    return (true_positives, false_positives, false_negatives,
+            calculate_accuracy(true_positives, false_positives, false_negatives),
+            any(count[4] for count in counts))
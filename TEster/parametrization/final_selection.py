@@ -0,0 +1,133 @@
+import csv
+import numpy as np
+from TEster.analysis.gff_parser import list_generated_sequences
+from TEster.analysis.results_table import PENALTY_ACCURACY
+
+# number of the best configurations re-evaluated before the final one is chosen
+FINAL_CANDIDATES = 5
+
+# fewest fresh sequences the candidates are compared on, so that their accuracies have a spread
+VALIDATION_SEQUENCES = 3
+
+# weight of the standard deviation subtracted from the mean accuracy of a candidate
+DEVIATION_WEIGHT = 1.0
+
+
+def evaluate_candidates(candidates, sequence_paths, tool, executor):
+    """
+    Evaluates every candidate on every sequence in a single batch of the executor
+
+    Parameters
+    ----------
+    candidates : list
+        dictionaries mapping parameter names to values
+    sequence_paths : list
+        paths to the directories of the sequences
+    tool : str
+        recognition tool used by nested-nester
+    executor : Executor
+        runs the nested-nester evaluations
+
+    Returns
+    -------
+    numpy.ndarray
+        accuracy of every candidate (rows) on every sequence (columns)
+    """
+    tasks = [(values, sequence_path, tool) for values in candidates for sequence_path in sequence_paths]
+    counts = executor.run(tasks)
+    return np.array([count[3] for count in counts], dtype=np.float64).reshape(len(candidates), len(sequence_paths))
+
+
+def rank_candidates(accuracies):
+    """
+    Ranks the candidates by their mean accuracy lowered by its standard
+    deviation, so a steady candidate beats one that was lucky on a single
+    sequence. Failed runs count as zero accuracy
+
+    Parameters
+    ----------
+    accuracies : numpy.ndarray
+        accuracy of every candidate (rows) on every sequence (columns)
+
+    Returns
+    -------
+    numpy.ndarray
+        indices of the candidates from the best one
+    numpy.ndarray
+        mean accuracy of every candidate
+    numpy.ndarray
+        standard deviation of the accuracy of every candidate
+    """
+    accuracies = np.where(accuracies == PENALTY_ACCURACY, 0, accuracies)
+    means = accuracies.mean(axis=1)
+    deviations = accuracies.std(axis=1)
+    order = np.lexsort((-means, -(means - DEVIATION_WEIGHT * deviations)))
+    return order, means, deviations
+
+
+def write_candidates(path, candidates, order, means, deviations):
+    """
+    Writes the ranking of the final candidates
+
+    Parameters
+    ----------
+    path : str
+        path to the csv file
+    candidates : ResultsTable
+        the candidates with the accuracy they reached during the search
+    order : numpy.ndarray
+        indices of the candidates from the best one
+    means : numpy.ndarray
+        mean accuracy of every candidate on the fresh sequences
+    deviations : numpy.ndarray
+        standard deviation of the accuracy of every candidate
+    """
+    rows = list(candidates.rows())
+    with open(path, "w") as csv_file:
+        outcsv = csv.writer(csv_file, delimiter=',', quotechar='|', quoting=csv.QUOTE_MINIMAL)
+        outcsv.writerow(["Rank"] + candidates.param_names + ["Search Accuracy", "Mean Accuracy", "Accuracy SD"])
+        for rank, index in enumerate(order, 1):
+            outcsv.writerow([rank] + rows[index][:len(candidates.param_names)] +
+                            [round(candidates["Accuracy"][index], 4), round(means[index], 4),
+                             round(deviations[index], 4)])
+
+
+def select_final_configuration(results, validation_path, tool, executor, out_dir, count=FINAL_CANDIDATES):
+    """
+    Re-evaluates the best configurations of the search on fresh sequences
+    and chooses the one doing best there
+
+    Parameters
+    ----------
+    results : ResultsTable
+        results of the search
+    validation_path : str
+        path to the directory of the fresh sequences
+    tool : str
+        recognition tool used by nested-nester
+    executor : Executor
+        runs the nested-nester evaluations
+    out_dir : str
+        path to the output directory
+    count : int
+        number of configurations to re-evaluate
+
+    Returns
+    -------
+    dict
+        the chosen configuration
+    """
+    candidates = results.top(count)
+    if len(candidates) < 2:
+        return results.best()
+
+    sequence_paths = list_generated_sequences(validation_path)
+    print("Re-evaluating the {} best configurations on {} fresh sequences".format(len(candidates),
+                                                                                len(sequence_paths)))
+    accuracies = evaluate_candidates(candidates.configurations(), sequence_paths, tool, executor)
+    order, means, deviations = rank_candidates(accuracies)
+    write_candidates("{}/final_candidates.csv".format(out_dir), candidates, order, means, deviations)
+
+    print("Final configuration: mean accuracy {:.3f} (SD {:.3f}), {:.3f} during the search".format(
+        means[order[0]], deviations[order[0]], candidates["Accuracy"][order[0]]))
+    return candidates.configurations()[order[0]]
@@ -0,0 +1,80 @@
+import os
+from TEster.analysis.gff_parser import get_generated_gff_path
+from TEster.utils.fasta import IndexedFasta
+
+# chunks of every session are kept in a directory named by its process id
+CHUNKS_PATH = "/tmp/TEster/chunks"
+
+# number of fidelity levels including the full sequences
+HALVING_RUNGS = 3
+
+
+def write_chunk(sequence_path, fraction, chunk_path):
+    """
+    Writes the beginning of a generated sequence together with the
+    elements that lie entirely inside it, in the layout of the generator
+
+    Parameters
+    ----------
+    sequence_path : str
+        path to the directory of the generated sequence
+    fraction : float
+        fraction of the sequence to keep
+    chunk_path : str
+        path to the directory of the chunk to create
+    """
+    fasta_path = "{}TEster_generated.fa".format(sequence_path)
+    with open(fasta_path, "rb") as fasta:
+        header = fasta.readline()
+
+    os.makedirs("{}data/GENERATED_1".format(chunk_path), exist_ok=True)
+
+    # the chunk is copied from the mapped file keeping its line layout
+    with IndexedFasta(fasta_path) as fasta, \
+            open("{}TEster_generated.fa".format(chunk_path), "wb") as chunk_fasta:
+        end = int(fasta.lengths[0] * fraction)
+        chunk_fasta.write(header)
+        chunk_fasta.write(fasta.region(0, 0, end))
+        if end > 0:
+            chunk_fasta.write(b"\n")
+
+    with open(get_generated_gff_path(sequence_path), "r") as gff, \
+            open("{}data/GENERATED_1/GENERATED_1.gff".format(chunk_path), "w") as chunk_gff:
+        for line in gff:
+            split_line = line.split()
+            if line[0] == "#" or (len(split_line) > 4 and int(split_line[4]) <= end):
+                chunk_gff.write(line)
+
+
+def create_rungs(sequence_paths, eta, rungs=HALVING_RUNGS):
+    """
+    Creates the test sets of the successive halving rungs, each rung
+    using eta times longer chunks of the generated sequences than the
+    previous one and the last rung using the whole sequences
+
+    Parameters
+    ----------
+    sequence_paths : list
+        paths to the directories of the generated sequences
+    eta : int
+        ratio of chunk lengths between neighbouring rungs
+    rungs : int
+        number of rungs
+
+    Returns
+    -------
+    list
+        paths to the sequence directories of every rung, from the shortest
+    """
+    rung_paths = []
+    for rung in range(rungs - 1):
+        fraction = eta ** -(rungs - 1 - rung)
+        paths = []
+        for number, sequence_path in enumerate(sequence_paths):
+            chunk_path = "{}/{}/rung_{}/sequence_{}/".format(CHUNKS_PATH, os.getpid(), rung, number)
+            write_chunk(sequence_path, fraction, chunk_path)
+            paths.append(chunk_path)
+        rung_paths.append(paths)
+
+    rung_paths.append(sequence_paths)
+    return rung_paths
@@ -1,13 +1,21 @@
-from statistics import mean, stdev
 from scipy import stats
+from TEster.analysis.sensitivity import weighted_kdes
 from TEster.utils.tester_utils import create_values_list
+from numpy import asarray, percentile, ravel
 from numpy.random import choice
 
+# share of the density of earlier sessions' results in a warm started distribution
+WARM_START_WEIGHT = 0.8
+
+# percentage of the database transposons scoring below the expected output score limit
+SCORE_PERCENTILE = 10
+
 
 class Parameter:
     """
     Class representing the attributes of the called parameter.
     self.values = all the values available for the current distribution
+    self.frozen_run = run in which the parameter was fixed at one value
     """
 
     def __init__(self):
@@ -19,8 +27,9 @@ class Parameter:
         element : sequence_generator.Element
             info of the average element in input database
         """
+        # run in which the parameter was frozen, None while it is searched
+        self.frozen_run = None
 
-        
     def set_values_initial(self, values, expected_value):
         """
         Sets the new initial values and updates distributions, mean
@@ -28,16 +37,16 @@ class Parameter:
 
         Parameters
         ----------
-        values : list
-            list of values to assign to the Parameter object
+        values : ValueGrid
+            grid of values to assign to the Parameter object
 
         """
         self.values = values
         if len(self.values) == 1:
             self.distribution = [1]
         else:
-            self.deviation = stdev(self.values)
-            self.distribution = [stats.norm.pdf(self.values, expected_value, self.deviation)]
+            self.deviation = self.values.array.std(ddof=1)
+            self.distribution = [stats.norm.pdf(self.values.array, expected_value, self.deviation)]
 
     def set_values(self, values):
         """
@@ -50,7 +59,64 @@ class Parameter:
             list of new values to assign to the Parameter object
         """
         values = create_values_list(self.name, min(values), max(values))
-        self.set_values_initial(values, mean(values))
+        self.set_values_initial(values, values.array.mean())
+
+    def freeze(self, value, run_number):
+        """
+        Fixes the parameter at a single value for the rest of the search
+
+        Parameters
+        ----------
+        value : int/float
+            the value to keep
+        run_number : int
+            run in which the parameter is frozen
+        """
+        self.frozen_run = run_number
+        self.set_values_initial(create_values_list(self.name, value, value), value)
+
+    def warm_start(self, values, weights):
+        """
+        Shifts the initial distribution towards the values that did well
+        in earlier sessions, keeping a share of it so that every value
+        stays reachable
+
+        Parameters
+        ----------
+        values : numpy.ndarray
+            values of the parameter used in earlier sessions
+        weights : numpy.ndarray
+            weight of each of the values
+        """
+        grid = self.values.array
+        values = asarray(values, dtype=float)
+        weights = asarray(weights, dtype=float)
+        inside = (values >= grid[0]) & (values <= grid[-1]) & (weights > 0)
+        values = values[inside]
+        weights = weights[inside]
+
+        if len(values) == 0 or len(grid) == 1:
+            return
+        if values.min() == values.max():
+            self.set_values_initial(self.values, values[0])
+            return
+
+        prior = ravel(self.distribution)
+        density = stats.gaussian_kde(values, bw_method='scott', weights=weights)(grid)
+        self.distribution = [WARM_START_WEIGHT * density / density.sum() +
+                             (1 - WARM_START_WEIGHT) * prior / prior.sum()]
+
+    def steer(self, element):
+        """
+        Centres the initial distribution on what the elements of the
+        input database suggest, parameters without such a hint keep
+        their defaults
+
+        Parameters
+        ----------
+        element : sequence_generator.Element
+            info of the average element in input database
+        """
 
     def choose_value(self):
         """
@@ -62,11 +128,28 @@ class Parameter:
         -------
             returns the chosen value
         """
-        chosen = choice(self.values, 1, self.distribution)[0]
+        probabilities = ravel(self.distribution)
+        chosen = choice(self.values.array, p=probabilities/probabilities.sum())
+        return self.convert(chosen)
+
+    def convert(self, value):
+        """
+        Converts a value taken from the values list into the type
+        the parameter is written into config.yml with
+
+        Parameters
+        ----------
+        value : int/float
+            value of the parameter
+
+        Returns
+        -------
+            the converted value
+        """
         if self.name == "M":
-            return round(float(chosen), 1)
+            return round(float(value), 1)
         else:
-            return int(chosen)
+            return int(value)
 
     def calculate_kde(self, values, accuracies):
         """
@@ -76,23 +159,12 @@ class Parameter:
 
         Parameters
         ----------
-        values : list
+        values : numpy.ndarray
             input values to calculate the kde from
-        accuracties : list
+        accuracties : numpy.ndarray
             accuracies achieved upon the given values
         """
-        min_accuracy = min(accuracies)
-
-        self.values = create_values_list(self.name, min(values), max(values))
-        if len(self.values) == 1:
-            self.distribution = [1]
-        else:
-            accuracy = [(i-min_accuracy) for i in accuracies]
-            if max(accuracy) == 0:
-                self.set_values(values)
-            else:
-                kernel = stats.gaussian_kde(values, bw_method='scott', weights=accuracy)
-                self.distribution = list(kernel(self.values))
+        calculate_kdes([self], asarray(values)[:, None], accuracies)
 
 
 class LtrFinderParameter(Parameter):
@@ -120,6 +192,13 @@ class LtrFinderParameter(Parameter):
         self.min, self.max, self.name, self.default = switcher.get(param)
         super().set_values_initial(create_values_list(self.name, self.min, self.max), self.default)
 
+    def steer(self, element):
+        # most of the database transposons should pass the score limit
+        if self.name != "S" or len(element.scores) == 0:
+            return
+        expected = percentile(element.scores, SCORE_PERCENTILE)
+        self.set_values_initial(self.values, min(max(expected, self.min), self.max))
+
 
 
 class LtrHarvestParameter(Parameter):
@@ -142,3 +221,42 @@ class LtrHarvestParameter(Parameter):
         }
         self.min, self.max, self.name, self.default = switcher.get(param)
         super().set_values_initial(create_values_list(self.name, self.min, self.max), self.default)
+
+
+def calculate_kdes(parameters, values, accuracies):
+    """
+    Calculates the Kernel Density Estimations of all the parameters
+    from their values using accuracies as weight assignments, evaluating
+    the kernels of every parameter together, and assigns them as
+    distributions to the parameters
+
+    Parameters
+    ----------
+    parameters : list
+        list of Parameter objects
+    values : numpy.ndarray
+        input values, one column per parameter
+    accuracies : numpy.ndarray
+        accuracies achieved upon the given values
+    """
+    values = asarray(values, dtype=float)
+    accuracy = asarray(accuracies) - asarray(accuracies).min()
+    # the kernel needs the weight spread over at least two values
+    weighted = values[accuracy > 0]
+
+    fitted = []
+    for column, param in enumerate(parameters):
+        bounds = param.convert(values[:, column].min()), param.convert(values[:, column].max())
+        param.values = create_values_list(param.name, *bounds)
+        if len(param.values) == 1:
+            param.distribution = [1]
+        elif len(weighted) == 0 or weighted[:, column].min() == weighted[:, column].max():
+            param.set_values(bounds)
+        else:
+            fitted.append(column)
+
+    if fitted:
+        densities = weighted_kdes(values[:, fitted], accuracy,
+                                  [parameters[column].values.array for column in fitted])
+        for column, density in zip(fitted, densities):
+            parameters[column].distribution = list(density)
@@ -1,150 +1,346 @@
-import csv
-import subprocess
 import os
+from numpy.lib import recfunctions
 import TEster.utils.tester_utils as tester_utils
-from TEster.analysis.gff_parser import get_accuracy, get_gff_path
-from TEster.parametrization.parameter import Parameter, LtrFinderParameter, LtrHarvestParameter
-from TEster.toolchain.TEster import tool_used
-from scipy import stats
-
-
-def split_gb_results(csv_path, mean) -> (dict, dict):
+from TEster.analysis.gff_parser import list_generated_sequences, load_ground_truth
+from TEster.analysis.result_cache import ResultCache
+from TEster.analysis.results_table import ResultsTable, FULL_FIDELITY, PENALTY_ACCURACY
+from TEster.analysis.sensitivity import parameter_sensitivity, write_sensitivity, \
+    write_frozen_parameters
+from TEster.parametrization.executor import LocalExecutor, run_configurations
+from TEster.parametrization.halving import create_rungs
+from TEster.parametrization.parameter import Parameter, LtrFinderParameter, LtrHarvestParameter, \
+    calculate_kdes
+from TEster.parametrization.checkpoint import Checkpoint, checkpoint_path, load_checkpoint
+from TEster.parametrization.search import create_strategy
+from TEster.parametrization.warm_start import load_history, warm_start_parameters
+from TEster.utils.profiling import profiler
+
+# runs continue while the good and bad values of a parameter differ by more than this statistic
+KS_THRESHOLD = 0.1
+
+# parameters whose good and bad values differ less than this likely by chance are frozen
+FREEZE_P_VALUE = 0.9
+
+# good and bad results needed each before any parameter is frozen
+MIN_FREEZE_SAMPLES = 10
+
+
+def split_gb_results(results, mean) -> (ResultsTable, ResultsTable):
     """
-    Splits the results obtained into good/bad based on median
+    Splits the results obtained into good/bad based on mean
 
     Parameters
     ----------
-    csv_path : str
-        The path to the csv file that contains the results
+    results : ResultsTable
+        results of the current run
     mean : float
         The value that splits results into good and bad
 
     Returns
     -------
     good
-        dictionary mapping all parameters to list of good values
+        table of the results above the mean
     bad
-        dictionary mapping all parameters to list of bad values
+        table of the remaining results, failed runs are left out of both
     """
-    line_count = 0
-    good = {}
-    bad = {}
-    for p in tester_utils.param_defaults:
-        good[p] = []
-        bad[p] = []
-    good["Accuracy"] = []
-    bad["Accuracy"] = []
-
-    with open(csv_path, "r") as csv_file:
-        csv_reader = csv.reader(csv_file, delimiter=',', quotechar='|', quoting=csv.QUOTE_MINIMAL)
-        for row in csv_reader:
-            line_count += 1
-            if line_count == 1:
-                continue
-            if round(float(row[-3]), 3) > mean:
-                tester_utils.add_to_dict(row, good)
-            else:
-                tester_utils.add_to_dict(row, bad)
-
-    return good, bad
+    return results.split(mean)
 
 
-def ks_test(parameters, good, bad) -> bool:
+def ks_test(parameters, good, sensitivity) -> bool:
     """
-    Wraps the Kolmogorov-Smirnov test and sets the values distribution
-    to good values
+    Sets the values distribution of every parameter to its good values
+    and checks the Kolmogorov-Smirnov statistics of the run
 
     Parameters
     ----------
     parameters : Parameter
         list of Parameter objects
-    good : dict
-        dictionary mapping all parameters to list of good values
-    bad : dict
-        dictionary mapping all parameters to list of bad values
+    good : ResultsTable
+        results above the mean
+    sensitivity : list
+        ranking created by parameter_sensitivity from the good and bad results
 
     Returns
     -------
     bool
-        True if there is a significant difference between good and bad
-        False if the difference is less than 0.2
+        True if the good and bad values of any parameter differ
+        False if every statistic is at most KS_THRESHOLD
     """
 
-    differing_distributions = False
+    if len(good) == 0:
+        return False
 
-    for param in parameters:
-        if len(good[param.name]) == 0:
-            return False
-        param.calculate_kde(good[param.name], good["Accuracy"])
-        bad_values = tester_utils.create_values_list(param.name, min(bad[param.name]), max(bad[param.name]))
-        if len(param.values) > 0 and len(bad_values) > 0:
-            KS_statistic, _ = stats.ks_2samp(param.values, bad_values)
+    values = recfunctions.structured_to_unstructured(good.data[[param.name for param in parameters]],
+                                                     dtype=float)
+    calculate_kdes(parameters, values, good["Accuracy"])
 
-            if KS_statistic > 0.1:
-                differing_distributions = True
+    # the statistic is nan for every parameter if there are no bad results
+    return any(statistic > KS_THRESHOLD for _, statistic, _, _, _ in sensitivity)
 
-    return differing_distributions
 
-
-def run_nester_iterations(outcsv, generated_path, parameters, iterations) -> int:
+def freeze_parameters(parameters, sensitivity, good, bad, run_number) -> list:
     """
-    Runs iterations of the parametrisation based on values chosen by
-    tester_utils.choose_value.
-    Adds them to config.yml and runs nested-nester
+    Freezes the parameters that show no measurable effect on the accuracy
+    at their value in the best configuration observed, so that the following
+    runs only search the sensitive ones. Nothing is frozen until both the
+    good and the bad results hold MIN_FREEZE_SAMPLES configurations, since
+    the p-values of smaller samples are too coarse. At least one parameter
+    stays searched
 
     Parameters
     ----------
-    outcsv : TextIOWrapper
-        file wrapped for writing results into
-    generated_path : str
-        path to the generated sequence file
     parameters : list
         list of Parameter objects
+    sensitivity : list
+        ranking created by parameter_sensitivity from the good and bad results
+    good : ResultsTable
+        results above the mean, holding the best configuration of the run
+    bad : ResultsTable
+        results below the mean
+    run_number : int
+        indicates which run is taking place
+
+    Returns
+    -------
+    list
+        the newly frozen Parameter objects
+    """
+    if len(good) < MIN_FREEZE_SAMPLES or len(bad) < MIN_FREEZE_SAMPLES:
+        return []
+
+    p_values = {name: p_value for name, _, p_value, _, _ in sensitivity}
+    searched = [param for param in parameters if param.frozen_run is None]
+    insensitive = sorted((param for param in searched if p_values[param.name] > FREEZE_P_VALUE),
+                         key=lambda param: -p_values[param.name])
+    if len(insensitive) == len(searched):
+        insensitive = insensitive[:-1]
+
+    best = good.best()
+    for param in insensitive:
+        param.freeze(best[param.name], run_number)
+
+    return insensitive
+
+
+def run_seed(seed, run_number):
+    """
+    Derives the seed of a single run so that every run draws
+    different values while the session stays reproducible
+
+    Parameters
+    ----------
+    seed : int
+        seed of the session, None for a random one
+    run_number : int
+        indicates which run is taking place
+
+    Returns
+    -------
+    list
+        seed of the run or None
+    """
+    return None if seed is None else [seed, run_number]
+
+
+def evaluate_configurations(configurations, sequence_paths, tool, executor, cache=None, stop_below=None) -> list:
+    """
+    Evaluates the configurations with nested-nester on the executor.
+    Each configuration is written once into a private config.yml.
+    Configurations found in the cache and repeated ones are not run again
+
+    Parameters
+    ----------
+    configurations : list
+        dictionaries mapping parameter names to values
+    sequence_paths : list
+        paths to the directories of the generated sequences
+    tool : str
+        recognition tool used by nested-nester
+    executor : Executor
+        runs the nested-nester evaluations
+    cache : ResultCache
+        results of previously evaluated configurations
+    stop_below : float
+        runs are stopped once their optimistic accuracy falls below this
+        accuracy, None never stops them
 
     Returns
     -------
-    int
-        sum of all the accuracies obtained to be used in calculating the mean
+    list
+        (TP, FP, FN, accuracy, stopped) tuples in the order of the configurations
+    """
+    # only configurations not seen before are run, each of them once
+    results = {}
+    pending = {}
+    for values in configurations:
+        key = tuple(values.values())
+        if key in results or key in pending:
+            continue
+        cached = cache.get(values) if cache is not None else None
+        if cached is not None:
+            results[key] = tuple(cached) + (False,)
+        else:
+            pending[key] = values
+
+    print("Running {} configurations, reusing {} results".format(len(pending), len(configurations) - len(pending)))
+    profiler.count("reused_results", len(configurations) - len(pending))
+
+    evaluated = run_configurations(list(pending.values()), sequence_paths, tool, executor, stop_below)
+    for (key, values), (TP, FP, FN, accuracy, stopped) in zip(pending.items(), evaluated):
+        results[key] = TP, FP, FN, accuracy, stopped
+        # failures depend on the limits of the session and stopped runs on its best accuracy,
+        # both are run again later
+        if cache is not None and accuracy != PENALTY_ACCURACY and not stopped:
+            cache.put(values, (TP, FP, FN, accuracy))
+
+    return [results[tuple(values.values())] for values in configurations]
+
+
+def evaluate_successive_halving(configurations, rungs, eta, tool, executor, cache=None, stop_below=None) -> list:
     """
-    accuracy_sum = 0
-    generated_file = "{}TEster_generated.fa".format(generated_path)
+    Evaluates all the configurations on the first rung and promotes the best
+    1/eta of them to every following rung. Configurations eliminated early
+    keep the result of the last rung they were evaluated on, marked by
+    the fidelity of that rung
 
-    for i in range(iterations):
-        print("Iteration", i)
-        param_values = []
-        for param in parameters:
-            chosen_value = param.choose_value()
+    Parameters
+    ----------
+    configurations : list
+        dictionaries mapping parameter names to values
+    rungs : list
+        paths to the generated sequence directories of every rung,
+        the last rung holding the whole sequences
+    eta : int
+        1/eta of the configurations is promoted to the next rung
+    tool : str
+        recognition tool used by nested-nester
+    executor : Executor
+        runs the nested-nester evaluations
+    cache : ResultCache
+        results of previously evaluated configurations on the whole sequences
+    stop_below : float
+        runs on the whole sequences are stopped once their optimistic
+        accuracy falls below this accuracy, None never stops them
 
-            tester_utils.edit_config(param.name, chosen_value)
-            param_values.append(chosen_value)
+    Returns
+    -------
+    list
+        (TP, FP, FN, accuracy, stopped) tuples in the order of the configurations
+    list
+        fraction of the whole sequences every result was scored on
+    """
+    results = [None] * len(configurations)
+    fidelities = [None] * len(configurations)
+    promoted = list(range(len(configurations)))
 
-        print("With parameters:", [i for i in tester_utils.param_defaults])
-        print("on values:", param_values)
-        subprocess.run(["nested-nester", "-d", "/tmp/TEster/nester_results", "-dt", tool_used, generated_file])
-        nester_gff_path = get_gff_path("/tmp/TEster/nester_results/data/")
-        generated_gff_path = "{}data/GENERATED_1/GENERATED_1.gff".format(generated_path)
+    for rung, sequence_paths in enumerate(rungs):
+        last_rung = rung == len(rungs) - 1
+        rung_results = evaluate_configurations([configurations[i] for i in promoted], sequence_paths, tool,
+                                               executor, cache if last_rung else None,
+                                               stop_below if last_rung else None)
+        for i, result in zip(promoted, rung_results):
+            results[i] = result
+            fidelities[i] = float(eta) ** -(len(rungs) - 1 - rung)
 
-        with open(nester_gff_path, "r") as nester_gff, open(generated_gff_path, "r") as generated:
-            TP, FP, FN, accuracy = get_accuracy(generated, nester_gff)
+        if not last_rung:
+            promoted = sorted(promoted, key=lambda i: -results[i][3])[:max(1, len(promoted) // eta)]
+            promoted.sort()
 
-        accuracy_sum += accuracy
+    return results, fidelities
 
-        param_values.extend((accuracy, FP, FN))
-        outcsv.writerow(param_values)
 
-    return accuracy_sum
+def run_nester_iterations(outcsv, rungs, checkpoint, iterations, tool, executor, jobs=1, cache=None, eta=1,
+                          early_stop=False) -> ResultsTable:
+    """
+    Runs iterations of the parametrisation on configurations chosen by
+    the search strategy, batch by batch, and appends the results to the
+    table of the checkpoint in the order of the iterations, copying them
+    into the csv file. The checkpoint is saved after every batch and
+    iterations it already contains are not run again
 
+    Parameters
+    ----------
+    outcsv : TextIOWrapper
+        file wrapped for exporting results into
+    rungs : list
+        paths to the generated sequence directories of every successive
+        halving rung, a single rung evaluates everything on the whole sequences
+    checkpoint : Checkpoint
+        state of the run holding the search strategy
+    iterations : int
+        number of configurations to evaluate
+    tool : str
+        recognition tool used by nested-nester
+    executor : Executor
+        runs the nested-nester evaluations
+    jobs : int
+        number of configurations proposed at once
+    cache : ResultCache
+        results of previously evaluated configurations
+    eta : int
+        1/eta of the configurations is promoted to the next rung
+    early_stop : bool
+        stop runs whose optimistic accuracy falls below the best accuracy
+        of the run, recording the counts of their output so far
 
-def run_analysis(generated_path, iterations, element, out_dir=".", parameters=[], run_number=1):
+    Returns
+    -------
+    ResultsTable
+        results of all the iterations of the run
+    """
+    strategy = checkpoint.strategy
+    results_table = checkpoint.results
+
+    while len(results_table) < iterations:
+        remaining = iterations - len(results_table)
+        # every batch has to be large enough to promote a configuration to the last rung
+        batch_size = min(max(strategy.batch_size(jobs, remaining), eta ** (len(rungs) - 1)), remaining)
+
+        with profiler.timer("sampling"):
+            configurations = strategy.propose(batch_size)
+        completed = results_table.completed()
+        stop_below = float(completed["Accuracy"].max()) if early_stop and len(completed) else None
+        results, fidelities = evaluate_successive_halving(configurations, rungs, eta, tool, executor, cache, stop_below)
+        # chunk scores and partial counts of stopped runs are not comparable with full scores
+        full = [i for i, fidelity in enumerate(fidelities) if fidelity == FULL_FIDELITY and not results[i][4]]
+        strategy.observe([configurations[i] for i in full], [results[i][3] for i in full])
+
+        batch_start = len(results_table)
+        for values, (TP, FP, FN, accuracy, stopped), fidelity in zip(configurations, results, fidelities):
+            print("Iteration", len(results_table))
+            print("With parameters:", list(values))
+            print("on values:", list(values.values()))
+            if accuracy == PENALTY_ACCURACY:
+                print("Failed: nested-nester crashed or exceeded the time or memory limit")
+            elif fidelity != FULL_FIDELITY:
+                print("Eliminated on a chunk of {:.0%} of the sequences".format(fidelity))
+            elif stopped:
+                print("Stopped early: unlikely to beat the best accuracy of the run")
+
+            profiler.count("iterations")
+            results_table.append(values, accuracy, FP, FN, fidelity, stopped)
+
+        outcsv.writerows(results_table.rows(batch_start))
+
+        with profiler.timer("checkpoint"):
+            checkpoint.save()
+
+    return results_table
+
+
+def run_analysis(generated_path, iterations, element, out_dir=".", parameters=[], run_number=1, jobs=1,
+                 strategy="kde", resume=False, seed=None, halving=0, executor=None, warm_start=None,
+                 early_stop=False, tool="ltr_finder"):
     """
     Runs nester multiple times on distributed parameter values
     Recursively narrowing down the distributions until good and bad results
-    differ very little. This final distribution is then optimal
+    differ very little. This final distribution is then optimal.
+    Model based strategies spend all the iterations in a single run instead
 
     Parameters
     ----------
     generated_path : str
-        path to the generated sequence file
+        path to the directory of the generated test set
     element : Element
         class containing information about the elements in the input database
     out_dir : str
@@ -154,33 +350,114 @@ def run_analysis(generated_path, iterations, element, out_dir=".", parameters=[]
         to narrow the distribution
     run_number : int
         indicates which run is taking place
+    jobs : int
+        number of nested-nester runs executed at once
+    strategy : str
+        search strategy choosing the configurations, "kde" or "tpe"
+    resume : bool
+        continue from the checkpoint saved in out_dir
+    seed : int
+        seed making the sampled configurations reproducible
+    halving : int
+        evaluate configurations with successive halving on chunks of the
+        generated sequences, promoting 1/halving of them per rung, 0 disables it
+    executor : Executor
+        runs the nested-nester evaluations, None runs them locally
+    warm_start : str
+        directory with results of earlier sessions seeding the first run
+    early_stop : bool
+        stop nested-nester runs unlikely to beat the best accuracy of the run
+    tool : str
+        recognition tool parametrised, "ltr_finder" or "ltr_harvest"
 
     Returns
     -------
-    dict
+    ResultsTable
         good configurations
-    dict
+    ResultsTable
         bad configurations
     """
-    os.makedirs(out_dir, exist_ok=True)
+    if executor is None:
+        with LocalExecutor(jobs) as executor:
+            return run_analysis(generated_path, iterations, element, out_dir, parameters, run_number, jobs, strategy,
+                                resume, seed, halving, executor, warm_start, early_stop, tool)
 
-    # TODO this needs to be updated for the parametrization
+    os.makedirs(out_dir, exist_ok=True)
 
-    if len(parameters) == 0:
-        if tool_used == "ltr_finder":
-            parameters = [LtrFinderParameter(p_name) for p_name in tester_utils.param_defaults]
-        elif tool_used == "ltr_harvest":
-            parameters = [LtrHarvestParameter(p_name) for p_name in tester_utils.param_defaults]
-    print("Initiating run number: ", run_number)
-    with open("{}/counts_run{}.csv".format(out_dir, run_number), "w+") as csv_file:
-        outcsv = tester_utils.prepare_csv(csv_file)
-        accuracy_sum = run_nester_iterations(outcsv, generated_path, parameters, iterations)
+    checkpoint = load_checkpoint(out_dir) if resume else None
 
-    good, bad = split_gb_results("{}/counts_run{}.csv".format(out_dir, run_number), round(accuracy_sum/iterations, 3))
+    if checkpoint is not None:
+        parameters = checkpoint.parameters
+        run_number = checkpoint.run_number
+        print("Resuming run number {} after {} iterations".format(run_number, len(checkpoint.results)))
+    else:
+        history = None
+        # TODO this needs to be updated for the parametrization
+        if len(parameters) == 0:
+            if tool == "ltr_finder":
+                parameters = [LtrFinderParameter(p_name) for p_name in tester_utils.param_defaults[tool]]
+            elif tool == "ltr_harvest":
+                parameters = [LtrHarvestParameter(p_name) for p_name in tester_utils.param_defaults[tool]]
+
+            if element is not None:
+                for param in parameters:
+                    param.steer(element)
+
+            if warm_start:
+                history, weights = load_history(warm_start, [param.name for param in parameters])
+                print("Warm start from {} results of earlier sessions".format(len(history)))
+                if len(history) > 0:
+                    warm_start_parameters(parameters, history, weights)
+
+        search = create_strategy(strategy, parameters, run_seed(seed, run_number))
+        if history is not None and len(history) > 0:
+            search.warm_start(history.configurations(), list(history["Accuracy"]), list(weights))
+
+        checkpoint = Checkpoint(checkpoint_path(out_dir), generated_path, run_number, parameters, search)
+        checkpoint.save()
 
-    differing_distributions = ks_test(parameters, good, bad)
+    print("Initiating run number: ", run_number)
+    profiler.run_number = run_number
+    cache_path = "{}/result_cache.sqlite".format(out_dir)
+    sequence_paths = list_generated_sequences(generated_path)
+    sequence_files = ["{}TEster_generated.fa".format(path) for path in sequence_paths]
+    with profiler.timer("chunking"):
+        rungs = create_rungs(sequence_paths, halving) if halving > 1 else [sequence_paths]
+    # the ground truth is parsed once here and only read by the evaluations
+    with profiler.timer("ground_truth"):
+        for rung_paths in rungs:
+            for sequence_path in rung_paths:
+                load_ground_truth(sequence_path)
+
+    with open("{}/counts_run{}.csv".format(out_dir, run_number), "w+") as csv_file, \
+            ResultCache(cache_path, sequence_files, tool) as cache:
+        outcsv = tester_utils.prepare_csv(csv_file, [param.name for param in parameters])
+        outcsv.writerows(checkpoint.results.rows())
+        results = run_nester_iterations(outcsv, rungs, checkpoint, iterations, tool, executor, jobs, cache,
+                                        max(halving, 1), early_stop)
+
+    with profiler.timer("statistics"):
+        completed = results.completed()
+        good, bad = split_gb_results(results, round(completed["Accuracy"].mean(), 3) if len(completed) else 0)
+
+        sensitivity = parameter_sensitivity(good, bad)
+        write_sensitivity("{}/sensitivity_run{}.csv".format(out_dir, run_number), sensitivity)
+        print("Parameters by sensitivity:", ", ".join("{} ({:.2f})".format(name, statistic)
+                                                      for name, statistic, _, _, _ in sensitivity))
+
+        if strategy != "kde":
+            return good, bad
+
+        differing_distributions = ks_test(parameters, good, sensitivity)
+
+        frozen = freeze_parameters(parameters, sensitivity, good, bad, run_number)
+        if frozen:
+            print("Freezing parameters:", ", ".join("{}={}".format(param.name, param.convert(param.values[0]))
+                                                    for param in frozen))
+        write_frozen_parameters("{}/frozen_parameters.csv".format(out_dir), parameters)
 
     if differing_distributions:
-        return run_analysis(generated_path, iterations, element, out_dir, parameters, run_number+1)
+        return run_analysis(generated_path, iterations, element, out_dir, parameters, run_number+1, jobs, strategy,
+                            seed=seed, halving=halving, executor=executor, early_stop=early_stop, tool=tool)
     else:
         return good, bad
@@ -0,0 +1,265 @@
+import json
+import socket
+import statistics
+import threading
+import time
+from collections import deque
+import TEster.utils.tester_utils as tester_utils
+from TEster.parametrization.executor import Executor, profiled_evaluation
+from TEster.utils.profiling import profiler
+
+# failed attempts of a task after which the whole batch fails
+RETRIES = 2
+
+# a task running this many times longer than the median one is started again on an idle worker
+STRAGGLER_FACTOR = 3.0
+
+# number of finished tasks needed before stragglers are recognized
+STRAGGLER_MIN_SAMPLES = 3
+
+# seconds between the checks of idle workers for stragglers
+STRAGGLER_POLL = 1.0
+
+
+class RemoteExecutionException(Exception):
+    def __init__(self, message):
+        self.message = message
+
+
+def parse_address(address):
+    """
+    Parameters
+    ----------
+    address : str
+        address in the HOST:PORT form
+
+    Returns
+    -------
+    tuple
+        host and port number
+    """
+    host, _, port = address.rpartition(":")
+    return host, int(port)
+
+
+class RemoteExecutor(Executor):
+    """
+    Hands the tasks out to TEster-worker processes that connect to the
+    driver over TCP. Every connected worker pulls one task at a time and
+    returns its counts as a JSON line. Tasks of lost or failing workers are
+    retried, and stragglers are started again on idle workers, keeping the
+    first result. The limits of the runs are sent with every task. The
+    generated sequences have to be reachable by the workers under the
+    paths sent with the tasks, e.g. on a shared filesystem
+    """
+
+    def __init__(self, address, timeout=None, memory_limit=None, retries=RETRIES,
+                 straggler_factor=STRAGGLER_FACTOR):
+        """
+        Parameters
+        ----------
+        address : tuple
+            host and port the workers connect to, port 0 picks a free one
+        timeout : float
+            wall time limit of a run in seconds, None leaves it to the workers
+        memory_limit : int
+            address space limit of a run in bytes, None leaves it to the workers
+        retries : int
+            failed attempts of a task after which the batch fails
+        straggler_factor : float
+            running time relative to the median after which a task is
+            started again, 0 disables it
+        """
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.retries = retries
+        self.straggler_factor = straggler_factor
+        self.server = socket.create_server(address)
+        self.address = self.server.getsockname()[:2]
+
+        self.condition = threading.Condition()
+        self.closed = False
+        self.batch = 0
+        self.tasks = []
+        self.pending = deque()
+        # task: start times of its running copies
+        self.running = {}
+        self.results = {}
+        self.failures = {}
+        self.error = None
+        self.durations = []
+        self.stop_below = None
+
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        """
+        Starts serving every worker that connects
+        """
+        while True:
+            try:
+                connection, address = self.server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(connection, address), daemon=True).start()
+
+    def _straggler(self):
+        """
+        Returns
+        -------
+        int
+            the longest running task taking too long with a single copy, or None
+        """
+        if not self.straggler_factor or len(self.durations) < STRAGGLER_MIN_SAMPLES:
+            return None
+
+        started_before = time.monotonic() - self.straggler_factor * statistics.median(self.durations)
+        stragglers = [(starts[0], task) for task, starts in self.running.items()
+                      if len(starts) == 1 and starts[0] < started_before and task not in self.results]
+        return min(stragglers)[1] if stragglers else None
+
+    def _next_task(self):
+        """
+        Waits for a task for an idle worker, called with the condition held
+
+        Returns
+        -------
+        tuple
+            batch and task numbers and the start time, or None once closed
+        """
+        while not self.closed:
+            if self.pending:
+                task = self.pending.popleft()
+            else:
+                task = self._straggler()
+            if task is not None:
+                start = time.monotonic()
+                self.running.setdefault(task, []).append(start)
+                return self.batch, task, start
+            self.condition.wait(STRAGGLER_POLL)
+        return None
+
+    def _finish(self, batch, task, start, reply):
+        """
+        Records the reply of a worker, called with the condition held
+        """
+        if batch != self.batch:
+            return
+        self.running[task].remove(start)
+
+        if "error" not in reply:
+            if task not in self.results:
+                self.results[task] = tuple(reply["result"])
+                self.durations.append(time.monotonic() - start)
+                profiler.merge(reply["profile"])
+        elif task not in self.results:
+            self.failures[task] = self.failures.get(task, 0) + 1
+            if self.failures[task] > self.retries:
+                self.error = RemoteExecutionException("configuration {} failed {} times, last error: {}".format(
+                    self.tasks[task][0], self.failures[task], reply["error"]))
+            elif not self.running[task]:
+                self.pending.append(task)
+
+        self.condition.notify_all()
+
+    def _serve(self, connection, address):
+        """
+        Sends tasks to a connected worker until the executor is closed
+        or the worker is lost
+        """
+        with connection, connection.makefile("rw") as stream:
+            while True:
+                with self.condition:
+                    assignment = self._next_task()
+                    if assignment is not None:
+                        batch, task, start = assignment
+                        values, sequence_path, tool = self.tasks[task]
+                        run_number = profiler.run_number
+                        stop_below = self.stop_below
+
+                if assignment is None:
+                    try:
+                        stream.write(json.dumps({"stop": True}) + "\n")
+                        stream.flush()
+                    except OSError:
+                        pass
+                    return
+
+                try:
+                    stream.write(json.dumps({"values": values, "sequence_path": sequence_path, "tool": tool,
+                                             "run_number": run_number, "stop_below": stop_below,
+                                             "timeout": self.timeout, "memory_limit": self.memory_limit}) + "\n")
+                    stream.flush()
+                    reply = json.loads(stream.readline())
+                    lost = False
+                except (OSError, ValueError):
+                    reply = {"error": "lost connection to worker {}:{}".format(*address)}
+                    lost = True
+
+                with self.condition:
+                    self._finish(batch, task, start, reply)
+                if lost:
+                    return
+
+    def run(self, tasks, stop_below=None):
+        with self.condition:
+            self.batch += 1
+            self.tasks = list(tasks)
+            self.stop_below = stop_below
+            self.pending = deque(range(len(self.tasks)))
+            self.running = {}
+            self.results = {}
+            self.failures = {}
+            self.error = None
+            self.condition.notify_all()
+
+            while len(self.results) < len(self.tasks) and self.error is None:
+                self.condition.wait()
+
+            self.pending.clear()
+            if self.error is not None:
+                raise self.error
+            return [self.results[task] for task in range(len(self.tasks))]
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.server.close()
+
+
+def serve_worker(address, timeout=None, memory_limit=None):
+    """
+    Connects to a RemoteExecutor and evaluates the tasks it sends
+    until it is closed. Like LocalExecutor, the worker refuses to run
+    if nested-nester cannot be given a private config.yml. Limits sent
+    by the driver take precedence over the ones of the worker
+
+    Parameters
+    ----------
+    address : tuple
+        host and port of the driver
+    timeout : float
+        wall time limit of nested-nester in seconds if the driver sets none, None for no limit
+    memory_limit : int
+        address space limit of nested-nester in bytes if the driver sets none, None for no limit
+    """
+    tester_utils.require_config_isolation()
+
+    with socket.create_connection(address) as connection, connection.makefile("rw") as stream:
+        for line in stream:
+            message = json.loads(line)
+            if message.get("stop"):
+                return
+
+            try:
+                (TP, FP, FN, accuracy, stopped), snapshot = profiled_evaluation(
+                    (message["values"], message["sequence_path"], message["tool"]), message["run_number"],
+                    message.get("timeout") or timeout, message.get("memory_limit") or memory_limit,
+                    message.get("stop_below"))
+                reply = {"result": [int(TP), int(FP), int(FN), float(accuracy), bool(stopped)], "profile": snapshot}
+            except Exception as ex:
+                reply = {"error": "{}: {}".format(type(ex).__name__, ex)}
+
+            stream.write(json.dumps(reply) + "\n")
+            stream.flush()
@@ -0,0 +1,75 @@
+import numpy as np
+
+
+class BatchSampler:
+    """
+    Draws whole batches of configurations from the distributions of all
+    parameters at once.
+    self.grid = values of all parameters concatenated into one array
+    self.cdf = cumulative probabilities of all parameters, the one of
+    the n-th parameter shifted by n so that they can be searched together
+    """
+
+    def __init__(self, parameters, rng=None):
+        """
+        Parameters
+        ----------
+        parameters : list
+            list of Parameter objects to sample
+        rng : numpy.random.Generator
+            seeded generator used for the draws
+        """
+        self.parameters = parameters
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        grids = []
+        cdfs = []
+        for position, param in enumerate(parameters):
+            grid = np.asarray(param.values, dtype=float)
+            probabilities = np.ravel(np.asarray(param.distribution, dtype=float))
+            if len(probabilities) != len(grid) or not probabilities.sum() > 0:
+                probabilities = np.ones(len(grid))
+
+            cdf = np.cumsum(probabilities / probabilities.sum())
+            cdf[-1] = 1.0
+
+            grids.append(grid)
+            cdfs.append(cdf + position)
+
+        self.grid = np.concatenate(grids)
+        self.cdf = np.concatenate(cdfs)
+
+    def sample(self, count):
+        """
+        Draws values of all parameters for count configurations
+        by inverse transform sampling in a single search
+
+        Parameters
+        ----------
+        count : int
+            number of configurations to draw
+
+        Returns
+        -------
+        numpy.ndarray
+            (count x parameters) matrix of the drawn values
+        """
+        draws = self.rng.random((count, len(self.parameters))) + np.arange(len(self.parameters))
+        return self.grid[np.searchsorted(self.cdf, draws, side="right")]
+
+    def sample_configurations(self, count):
+        """
+        Draws count configurations
+
+        Parameters
+        ----------
+        count : int
+            number of configurations to draw
+
+        Returns
+        -------
+        list
+            dictionaries mapping parameter names to values
+        """
+        return [{param.name: param.convert(value) for param, value in zip(self.parameters, row)}
+                for row in self.sample(count)]
@@ -0,0 +1,236 @@
+import numpy as np
+from TEster.parametrization.sampler import BatchSampler
+
+
+class SearchStrategy:
+    """
+    Chooses the configurations to evaluate next.
+    self.observations = all (configuration, accuracy) pairs evaluated so far
+    self.weights = weight of every observation, below 1 for earlier sessions
+    """
+
+    def __init__(self, parameters, seed=None):
+        """
+        Parameters
+        ----------
+        parameters : list
+            list of Parameter objects spanning the search space
+        seed : int/list
+            seed of the random generator
+        """
+        self.parameters = parameters
+        self.observations = []
+        self.weights = []
+        self.rng = np.random.default_rng(seed)
+        self.sampler = BatchSampler(parameters, self.rng)
+
+    def batch_size(self, jobs, remaining):
+        """
+        Number of configurations proposed at once
+
+        Parameters
+        ----------
+        jobs : int
+            number of configurations evaluated at once
+        remaining : int
+            number of evaluations left in the run
+
+        Returns
+        -------
+        int
+            size of the next batch
+        """
+        return min(jobs, remaining)
+
+    def propose(self, count):
+        """
+        Chooses the configurations to evaluate next
+
+        Parameters
+        ----------
+        count : int
+            number of configurations to choose
+
+        Returns
+        -------
+        list
+            dictionaries mapping parameter names to values
+        """
+        raise NotImplementedError
+
+    def observe(self, configurations, accuracies):
+        """
+        Records the accuracies achieved by evaluated configurations
+
+        Parameters
+        ----------
+        configurations : list
+            dictionaries mapping parameter names to values
+        accuracies : list
+            accuracy achieved by each of the configurations
+        """
+        self.observations.extend(zip(configurations, accuracies))
+        self.weights.extend([1.0] * len(configurations))
+
+    def warm_start(self, configurations, accuracies, weights):
+        """
+        Records results of earlier sessions as observations of lower weight
+
+        Parameters
+        ----------
+        configurations : list
+            dictionaries mapping parameter names to values
+        accuracies : list
+            accuracy achieved by each of the configurations
+        weights : list
+            weight of each of the configurations
+        """
+        self.observations.extend(zip(configurations, accuracies))
+        self.weights.extend(weights)
+
+
+class KdeStrategy(SearchStrategy):
+    """
+    Samples every parameter independently from its distribution, which
+    run_analysis narrows with calculate_kdes after each run
+    """
+
+    def propose(self, count):
+        return self.sampler.sample_configurations(count)
+
+
+class TpeStrategy(SearchStrategy):
+    """
+    Tree-structured Parzen estimator. Observations are split into the best
+    gamma fraction and the rest, each parameter gets a density over its values
+    for both groups and candidates drawn from the good density are ranked by
+    the ratio of the two
+    """
+
+    def __init__(self, parameters, gamma=0.25, startup=10, candidates=64, seed=None):
+        """
+        Parameters
+        ----------
+        parameters : list
+            list of Parameter objects spanning the search space
+        gamma : float
+            fraction of the observations considered good
+        startup : int
+            number of configurations sampled from the initial distributions
+            before the model is used
+        candidates : int
+            number of candidates ranked for every proposed configuration
+        seed : int/list
+            seed of the random generator
+        """
+        super().__init__(parameters, seed)
+        self.gamma = gamma
+        self.startup = startup
+        self.candidates = candidates
+
+    def propose(self, count):
+        if len(self.observations) < self.startup:
+            return self.sampler.sample_configurations(count)
+
+        accuracies = np.array([accuracy for _, accuracy in self.observations])
+        order = np.argsort(-accuracies, kind="stable")
+        good_count = max(1, int(np.ceil(self.gamma * len(order))))
+        good = [self.observations[i][0] for i in order[:good_count]]
+        bad = [self.observations[i][0] for i in order[good_count:]]
+        weights = np.asarray(self.weights, dtype=float)
+        good_weights = weights[order[:good_count]]
+        bad_weights = weights[order[good_count:]]
+
+        # log density ratio of every candidate summed over the parameters
+        total = count * self.candidates
+        scores = np.zeros(total)
+        chosen = {}
+        for param in self.parameters:
+            grid = np.asarray(param.values, dtype=float)
+            prior = np.ravel(np.asarray(param.distribution, dtype=float))
+            if len(prior) != len(grid):
+                prior = np.ones(len(grid))
+
+            good_density = parzen_density(grid, [values[param.name] for values in good], prior, good_weights)
+            bad_density = parzen_density(grid, [values[param.name] for values in bad], prior, bad_weights)
+
+            positions = self.rng.choice(len(grid), size=total, p=good_density)
+            scores += np.log(good_density[positions]) - np.log(bad_density[positions])
+            chosen[param.name] = grid[positions]
+
+        configurations = []
+        seen = set()
+        for candidate in np.argsort(-scores, kind="stable"):
+            values = {param.name: param.convert(chosen[param.name][candidate]) for param in self.parameters}
+            key = tuple(values.values())
+            if key not in seen:
+                seen.add(key)
+                configurations.append(values)
+            if len(configurations) == count:
+                break
+
+        return configurations
+
+
+def parzen_density(grid, samples, prior, weights=None):
+    """
+    Gaussian Parzen window density of the weighted samples over the value
+    grid mixed with the prior distribution as one pseudo-observation
+
+    Parameters
+    ----------
+    grid : numpy.ndarray
+        values the parameter can take
+    samples : list
+        observed values of the parameter
+    prior : numpy.ndarray
+        unnormalized prior probability of every grid value
+    weights : numpy.ndarray
+        weight of every sample, None weighs them equally
+
+    Returns
+    -------
+    numpy.ndarray
+        normalized probability of every grid value
+    """
+    prior = prior / prior.sum()
+    if len(samples) == 0 or len(grid) == 1:
+        return prior
+
+    samples = np.asarray(samples, dtype=float)
+    weights = np.ones(len(samples)) if weights is None else np.asarray(weights, dtype=float)
+    span = grid[-1] - grid[0]
+
+    # Silverman's rule limited from below so that single values still spread
+    bandwidth = max(1.06 * samples.std() * len(samples) ** -0.2, span / 100, 1e-12)
+    kernels = (np.exp(-0.5 * ((grid[:, None] - samples[None, :]) / bandwidth) ** 2) * weights).sum(axis=1)
+
+    density = kernels / kernels.sum() if kernels.sum() > 0 else prior
+    density = (weights.sum() * density + prior) / (weights.sum() + 1)
+
+    # keeps every value reachable so that the log ratio stays finite
+    density = np.maximum(density, 1e-12)
+    return density / density.sum()
+
+
+def create_strategy(name, parameters, seed=None):
+    """
+    Creates the search strategy of the given name
+
+    Parameters
+    ----------
+    name : str
+        "kde" or "tpe"
+    parameters : list
+        list of Parameter objects spanning the search space
+    seed : int/list
+        seed of the random generator
+
+    Returns
+    -------
+    SearchStrategy
+        the created strategy
+    """
+    if name == "tpe":
+        return TpeStrategy(parameters, seed=seed)
+    return KdeStrategy(parameters, seed)
@@ -0,0 +1,83 @@
+import csv
+import glob
+import os
+import time
+import numpy as np
+from TEster.analysis.results_table import ResultsTable, FULL_FIDELITY, PENALTY_ACCURACY
+
+# age in days after which the results of an earlier session count half
+HALF_LIFE_DAYS = 30
+
+
+def load_history(directory, param_names, now=None) -> (ResultsTable, np.ndarray):
+    """
+    Loads the results of earlier sessions from the counts_run*.csv files
+    found under the directory, weighting every file by its age. Files of
+    another recognition tool, failed runs and results scored only on
+    chunks of the sequences are skipped
+
+    Parameters
+    ----------
+    directory : str
+        path to analysis output directories of earlier sessions
+    param_names : list
+        names of the parameters being tuned
+    now : float
+        current time in seconds since the epoch, None for the clock
+
+    Returns
+    -------
+    ResultsTable
+        the earlier results
+    numpy.ndarray
+        recency weight of every result
+    """
+    now = time.time() if now is None else now
+    history = ResultsTable(param_names)
+    weights = []
+
+    for path in sorted(glob.glob(os.path.join(directory, "**", "counts_run*.csv"), recursive=True)):
+        weight = 0.5 ** ((now - os.path.getmtime(path)) / (HALF_LIFE_DAYS * 24 * 3600))
+
+        with open(path, "r") as csv_file:
+            csv_reader = csv.reader(csv_file, delimiter=',', quotechar='|', quoting=csv.QUOTE_MINIMAL)
+            header = next(csv_reader, [])
+            if any(name not in header for name in list(param_names) + ["Accuracy"]):
+                continue
+
+            columns = [header.index(name) for name in param_names]
+            for row in csv_reader:
+                accuracy = float(row[header.index("Accuracy")])
+                if accuracy == PENALTY_ACCURACY:
+                    continue
+                # files written before the fidelity was recorded hold full results only
+                if "Fidelity" in header and float(row[header.index("Fidelity")]) != FULL_FIDELITY:
+                    continue
+                # stopped runs only count the output written before they were stopped
+                if "Stopped" in header and int(row[header.index("Stopped")]):
+                    continue
+                history.append({name: float(row[column]) for name, column in zip(param_names, columns)}, accuracy,
+                               int(row[header.index("False Positives")]), int(row[header.index("False Negatives")]))
+                weights.append(weight)
+
+    return history, np.asarray(weights, dtype=float)
+
+
+def warm_start_parameters(parameters, history, weights):
+    """
+    Seeds the initial distributions of the parameters with the results of
+    earlier sessions, better and more recent results weighing more
+
+    Parameters
+    ----------
+    parameters : list
+        list of Parameter objects with their initial distributions
+    history : ResultsTable
+        results of earlier sessions
+    weights : numpy.ndarray
+        recency weight of every result
+    """
+    accuracies = history["Accuracy"]
+    quality = (accuracies - accuracies.min()) * weights
+    for param in parameters:
+        param.warm_start(history[param.name], quality)
@@ -1,12 +1,24 @@
 
 import click
+import os
+import shutil
 import sys
-from TEster.init.sequence_generator import sequence_generator, EmptyInputFileException
+from TEster.init.sequence_generator import sequence_generator, generate_validation_set, EmptyInputFileException, \
+    VALIDATION_PATH
 from TEster.init.run_finder import run_finder
+from TEster.init.run_harvest import run_harvest
+from TEster.parametrization.checkpoint import load_checkpoint
+from TEster.parametrization.executor import LocalExecutor
+from TEster.parametrization.final_selection import select_final_configuration, FINAL_CANDIDATES, \
+    VALIDATION_SEQUENCES
+from TEster.parametrization.halving import CHUNKS_PATH
 from TEster.parametrization.parameter_tester import run_analysis
-from TEster.utils.tester_utils import reset_config, set_config_to_final
-
-tool_used = None
+from TEster.parametrization.remote import RemoteExecutor, RemoteExecutionException, parse_address
+from TEster.utils.artifact_cache import ArtifactCache
+from TEster.utils.fasta import FastaFormatException
+from TEster.utils.profiling import profiler
+from TEster.utils.tester_utils import reset_config, set_config_to_final, preserved_config, \
+    ConfigIsolationException
 
 
 @click.command()
@@ -15,36 +27,126 @@ tool_used = None
 @click.option("analysis_out_dir", "-d", default="analysis/", help='Output directory')
 @click.option("sensitivity", "-s", default=200, help="Number of iterations for TEster to run")
 @click.option("sequence_database", "-i", type=click.Path(exists=True), help='Reference element database')
-@click.option("te_recognition_tool", "-t", default="ltr_finder", help='Specifies which recognition tool is to be parametrised, options: \"ltr_finder\", \"ltr_harvest\"')
-def main(input_file, element_percentage, analysis_out_dir, sensitivity, sequence_database):
+@click.option("te_recognition_tool", "-t", default="ltr_finder", type=click.Choice(["ltr_finder", "ltr_harvest"]), help='Specifies which recognition tool is to be parametrised, options: \"ltr_finder\", \"ltr_harvest\"')
+@click.option("jobs", "-j", "--jobs", default=1, help="Number of nested-nester runs executed at once")
+@click.option("strategy", "--strategy", default="kde", type=click.Choice(["kde", "tpe"]), help='Search strategy, \"kde\" recursively narrows the parameter distributions, \"tpe\" uses a Parzen estimator optimizer')
+@click.option("resume", "--resume", is_flag=True, help="Continue the session checkpointed in the output directory")
+@click.option("seed", "--seed", type=int, help="Seed of the random generator for reproducible sampling")
+@click.option("sequences", "-n", "--sequences", default=1, help="Number of independent test sequences to generate")
+@click.option("halving", "--halving", default=0, help="Score candidates on sequence chunks first, promoting the best 1/N of them to longer chunks, 0 disables it")
+@click.option("cache_size", "--cache-size", default=10.0, help="Size limit in GB of the cache of databases and generated sequences, 0 disables it")
+@click.option("workers", "--workers", help="Send the nested-nester runs to TEster-worker processes connecting to HOST:PORT instead of running them locally")
+@click.option("warm_start", "--warm-start", type=click.Path(exists=True, file_okay=False), help="Directory with the counts_run*.csv results of earlier sessions to start the search from")
+@click.option("timeout", "--timeout", default=0.0, help="Kill nested-nester runs taking longer than this many seconds and count them as failed, 0 disables it")
+@click.option("memory_limit", "--memory-limit", default=0.0, help="Memory limit in GB of a nested-nester run, runs exceeding it count as failed, 0 disables it")
+@click.option("early_stop", "--early-stop", is_flag=True, help="Stop nested-nester runs whose output so far makes beating the best accuracy of the run unlikely, with a single test sequence")
+@click.option("final_candidates", "--final-candidates", default=FINAL_CANDIDATES, help="Re-evaluate this many best configurations on freshly generated sequences and keep the steadiest one, 1 disables it")
+@click.option("profile_report", "--profile", type=click.Path(), help="Write a JSON timing report to the given path, or CSV if it ends with .csv")
+def main(input_file, element_percentage, analysis_out_dir, sensitivity, sequence_database, te_recognition_tool, jobs,
+         strategy, resume, seed, sequences, halving, cache_size, workers, warm_start,
+         timeout, memory_limit, early_stop, final_candidates, profile_report):
 
     tool_used = te_recognition_tool
 
-    # generate from default or given database
-    if not sequence_database:
-        print("Database not provided, creating artificial database")
-        reset_config()
-        if tool_used == "ltr_finder":
-            sequence_database = run_finder(input_file)
+    checkpoint = load_checkpoint(analysis_out_dir) if resume else None
+    if resume and (checkpoint is None or not os.path.exists(checkpoint.generated_path)):
+        print("No resumable checkpoint found in {}, starting a new session".format(analysis_out_dir))
+        checkpoint = None
+
+    cache = ArtifactCache(max_bytes=int(cache_size * 1024 ** 3)) if cache_size > 0 else None
+
+    # the installed config.yml is restored after the database building and the nester runs,
+    # which rewrite it when nested is installed system-wide or no database is given
+    with preserved_config():
+        # the resumed session continues on its generated sequence
+        if checkpoint is not None:
+            element, generated_file = None, checkpoint.generated_path
+            if cache is not None:
+                cache.lease(generated_file)
+        else:
+            try:
+                # generate from default or given database
+                if not sequence_database:
+                    print("Database not provided, creating artificial database")
+                    reset_config(tool_used)
+                    with profiler.timer("database"):
+                        if tool_used == "ltr_finder":
+                            sequence_database = run_finder(input_file, jobs, cache)
+                        else:
+                            sequence_database = run_harvest(input_file, jobs, cache)
+
+                # only the parameters of ltr_finder are steered by the database elements
+                with profiler.timer("generation"):
+                    element, generated_file = sequence_generator(input_file, sequence_database, element_percentage,
+                                                                 cache, sequences, jobs,
+                                                                 profile=tool_used == "ltr_finder")
+
+            # if the query sequence is empty/invalid
+            except EmptyInputFileException as ex:
+                print("Error: Invalid reference database file given {}".format(ex.message))
+                print("Provide a valid database or run the program without a reference database")
+                sys.exit(1)
+
+            # if the query sequence or the database cannot be indexed
+            except FastaFormatException as ex:
+                print("Error: {}".format(ex.message))
+                print("Provide FASTA files whose records have lines of equal length except for the last one")
+                sys.exit(1)
+
+        if workers:
+            executor = RemoteExecutor(parse_address(workers), timeout or None, int(memory_limit * 1024 ** 3) or None)
+            print("Waiting for TEster-worker processes on {}:{}".format(*executor.address))
         else:
-            sequence_database = run_harvest(input_file)
-    try:
-        element, generated_file = sequence_generator(input_file, sequence_database, element_percentage)
-
-    # if the query sequence is empty/invalid
-    except EmptyInputFileException as ex:
-        print("Error: Invalid reference database file given {}".format(ex.message))
-        print("Provide a valid database or run the program without a reference database")
-        sys.exit(1)
-
-    # runs analysis to detect a good configuration
-    good_values, bad_values = run_analysis(generated_file, sensitivity, element, analysis_out_dir)
-
-    # chooses best configuration
-    if len(good_values["o"]) != 0:
-        set_config_to_final(good_values, input_file, analysis_out_dir)
-    else:
-        set_config_to_final(bad_values, input_file, analysis_out_dir)
+            executor = LocalExecutor(jobs, timeout or None, int(memory_limit * 1024 ** 3) or None)
+
+        # runs analysis to detect a good configuration
+        try:
+            with executor:
+                good_values, bad_values = run_analysis(generated_file, sensitivity, element, analysis_out_dir,
+                                                       jobs=jobs, strategy=strategy, resume=checkpoint is not None,
+                                                       seed=seed, halving=halving, executor=executor,
+                                                       warm_start=warm_start, early_stop=early_stop, tool=tool_used)
+
+                if len(good_values) == 0 and len(bad_values) == 0:
+                    print("Error: every nested-nester run failed, consider raising --timeout or --memory-limit")
+                    sys.exit(1)
+
+                # chooses best configuration
+                with profiler.timer("final_selection"):
+                    results = good_values if len(good_values) != 0 else bad_values
+                    if final_candidates > 1:
+                        if sequence_database:
+                            validation_path = generate_validation_set(input_file, sequence_database,
+                                                                      element_percentage,
+                                                                      max(sequences, VALIDATION_SEQUENCES))
+                        else:
+                            print("No database to generate fresh sequences from, "
+                                  "re-evaluating the candidates on the test sequences")
+                            validation_path = generated_file
+                        final_values = select_final_configuration(results, validation_path, tool_used, executor,
+                                                                  analysis_out_dir, final_candidates)
+                    else:
+                        final_values = results.best()
+
+        # if parallel runs cannot be given their own config.yml
+        except ConfigIsolationException as ex:
+            print("Error: {}".format(ex.message))
+            sys.exit(1)
+
+        # if a configuration keeps failing on the workers
+        except RemoteExecutionException as ex:
+            print("Error: {}".format(ex.message))
+            sys.exit(1)
+
+    # the chunks and fresh sequences of the session are not needed for resuming it
+    for path in (CHUNKS_PATH, VALIDATION_PATH):
+        shutil.rmtree("{}/{}".format(path, os.getpid()), ignore_errors=True)
+
+    with profiler.timer("final"):
+        set_config_to_final(final_values, input_file, analysis_out_dir)
+
+    if profile_report:
+        profiler.write_report(profile_report)
 
 
 
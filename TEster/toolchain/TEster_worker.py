@@ -0,0 +1,26 @@
+import click
+import sys
+from TEster.parametrization.remote import parse_address, serve_worker
+from TEster.utils.tester_utils import ConfigIsolationException
+
+
+@click.command()
+@click.argument("address", required=True)
+@click.option("timeout", "--timeout", default=0.0, help="Kill nested-nester runs taking longer than this many seconds unless the session sets --timeout, 0 disables it")
+@click.option("memory_limit", "--memory-limit", default=0.0, help="Memory limit in GB of a nested-nester run unless the session sets --memory-limit, 0 disables it")
+def main(address, timeout, memory_limit):
+    """
+    Evaluates configurations for the TEster session started with --workers ADDRESS (HOST:PORT).
+    The sequences of the session need to be available under the paths it sends
+    """
+    try:
+        serve_worker(parse_address(address), timeout or None, int(memory_limit * 1024 ** 3) or None)
+
+    # if the runs of this node cannot be given their own config.yml
+    except ConfigIsolationException as ex:
+        print("Error: {}".format(ex.message))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
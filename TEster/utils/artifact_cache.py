@@ -0,0 +1,224 @@
+import hashlib
+import os
+import shutil
+import uuid
+
+CACHE_PATH = os.path.expanduser("~/.cache/TEster")
+
+# prefix of the files marking an entry as used by the process whose id follows it
+LEASE_PREFIX = ".lease_"
+
+
+class ArtifactCache:
+    """
+    Content addressed store of files created during startup, such as artificial
+    databases and generated sequences. Every entry is a directory named by the
+    hash of everything the artifact was created from. Entries are evicted least
+    recently used first once the cache grows over its size limit, except for
+    the ones leased by running sessions
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=10 * 1024 ** 3):
+        """
+        Parameters
+        ----------
+        path : str
+            directory holding the cache entries
+        max_bytes : int
+            size limit of the cache
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def key(*parts):
+        """
+        Creates the key of an artifact
+
+        Parameters
+        ----------
+        parts : str/int/float
+            everything the artifact depends on, e.g. input file hashes and settings
+
+        Returns
+        -------
+        str
+            hexadecimal key of the artifact
+        """
+        return hashlib.sha256("\0".join(str(part) for part in parts).encode()).hexdigest()
+
+    def lookup(self, key):
+        """
+        Finds the entry of the key and marks it as recently used
+
+        Parameters
+        ----------
+        key : str
+            key created by ArtifactCache.key
+
+        Returns
+        -------
+        str
+            path to the entry directory or None if the artifact is not cached
+        """
+        entry = os.path.join(self.path, key)
+        if not os.path.isdir(entry):
+            return None
+
+        os.utime(entry)
+        self.lease(entry)
+        return entry
+
+    def lease(self, path):
+        """
+        Protects the entry holding the path from eviction for as long as
+        the current process runs
+
+        Parameters
+        ----------
+        path : str
+            path to an entry or to a file inside it, paths outside the cache are ignored
+        """
+        relative = os.path.relpath(os.path.abspath(path), os.path.abspath(self.path))
+        if relative.startswith(os.pardir) or relative == os.curdir:
+            return
+
+        entry = os.path.join(self.path, relative.split(os.sep)[0])
+        if os.path.isdir(entry):
+            open(os.path.join(entry, "{}{}".format(LEASE_PREFIX, os.getpid())), "w").close()
+
+    def store(self, key, source):
+        """
+        Copies a file or the content of a directory into a new entry
+
+        Parameters
+        ----------
+        key : str
+            key created by ArtifactCache.key
+        source : str
+            file or directory to store
+
+        Returns
+        -------
+        str
+            path to the entry directory
+        """
+        entry = os.path.join(self.path, key)
+        staging = os.path.join(self.path, ".{}".format(uuid.uuid4().hex))
+
+        # entries appear complete or not at all
+        if os.path.isdir(source):
+            shutil.copytree(source, staging)
+        else:
+            os.makedirs(staging)
+            shutil.copy2(source, staging)
+
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(staging, entry)
+        self.lease(entry)
+
+        self.evict()
+        return entry
+
+    def get_or_create(self, key, create, file_name=None):
+        """
+        Returns the cached artifact, creating and storing it first if needed
+
+        Parameters
+        ----------
+        key : str
+            key created by ArtifactCache.key
+        create : function
+            creates the artifact and returns the path to it
+        file_name : str
+            name of the file for artifacts that are single files
+
+        Returns
+        -------
+        str
+            path to the cached file or directory
+        """
+        entry = self.lookup(key)
+        if entry is None:
+            entry = self.store(key, create())
+        else:
+            print("Reusing cached artifact {}".format(entry))
+
+        return os.path.join(entry, file_name) if file_name is not None else entry
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits its size
+        limit. Files kept next to the entries, such as the element annotations,
+        count towards the limit too
+        """
+        entries = []
+        total = 0
+        for name in os.listdir(self.path):
+            entry = os.path.join(self.path, name)
+            if name.startswith("."):
+                continue
+            if not os.path.isdir(entry):
+                total += os.path.getsize(entry)
+            elif in_use(entry):
+                total += directory_size(entry)
+            else:
+                entries.append((os.stat(entry).st_mtime, directory_size(entry), entry))
+
+        total += sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+
+def in_use(entry):
+    """
+    Checks the leases of an entry, removing the ones of finished processes
+
+    Parameters
+    ----------
+    entry : str
+        path to the entry directory
+
+    Returns
+    -------
+    bool
+        True if a running process leased the entry
+    """
+    used = False
+    for name in os.listdir(entry):
+        if not name.startswith(LEASE_PREFIX):
+            continue
+        try:
+            os.kill(int(name[len(LEASE_PREFIX):]), 0)
+            used = True
+        except ProcessLookupError:
+            try:
+                os.remove(os.path.join(entry, name))
+            except FileNotFoundError:
+                pass
+        except PermissionError:
+            # processes of other users still count as running
+            used = True
+        except ValueError:
+            continue
+    return used
+
+
+def directory_size(path):
+    """
+    Parameters
+    ----------
+    path : str
+        path to the directory
+
+    Returns
+    -------
+    int
+        size of all the files in the directory in bytes
+    """
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, files in os.walk(path) for name in files)
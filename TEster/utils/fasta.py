@@ -0,0 +1,221 @@
+import mmap
+import os
+import numpy as np
+
+# bytes of the file scanned at once while counting line breaks
+SCAN_WINDOW = 1 << 26
+
+# bytes that may follow the last base of a record
+TRAILING_WHITESPACE = b" \t\r\n"
+
+
+class FastaFormatException(Exception):
+    """ Raised if the lines of a FASTA record
+        differ in length and cannot be indexed """
+
+    def __init__(self, message):
+        self.message = message
+
+
+class IndexedFasta:
+    """
+    Random access to the records of a FASTA file through a memory map and
+    a faidx-style index, kept next to the file as <file>.fai when possible.
+    Records are addressed by their number since database headers repeat ids.
+    self.lengths = number of bases of every record
+    """
+
+    def __init__(self, path):
+        """
+        Parameters
+        ----------
+        path : str
+            path to the FASTA file
+        """
+        self.path = path
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size > 0 else b""
+
+        index_path = "{}.fai".format(path)
+        if os.path.exists(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(path):
+            self.load_index(index_path)
+        else:
+            self.build_index()
+            try:
+                self.write_index(index_path)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.names)
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+    def count_line_breaks(self, start, end):
+        """
+        Parameters
+        ----------
+        start : int
+            first byte of the counted region
+        end : int
+            byte after the counted region
+
+        Returns
+        -------
+        int
+            number of line feeds and carriage returns in the region
+        """
+        data = np.frombuffer(self.map, dtype=np.uint8)
+        count = 0
+        for window in range(start, end, SCAN_WINDOW):
+            chunk = data[window:min(window + SCAN_WINDOW, end)]
+            count += np.count_nonzero((chunk == 10) | (chunk == 13))
+        return count
+
+    def build_index(self):
+        """
+        Scans the file for records and their line layout
+        """
+        self.names, lengths, offsets, line_bases, line_widths = [], [], [], [], []
+
+        size = len(self.map)
+        data = np.frombuffer(self.map, dtype=np.uint8)
+        if self.map[:1] == b">":
+            header = 0
+        else:
+            header = self.map.find(b"\n>") + 1 or None
+
+        while header is not None:
+            header_end = self.map.find(b"\n", header)
+            offset = size if header_end == -1 else header_end + 1
+            next_header = self.map.find(b"\n>", offset - 1)
+            end = size if next_header == -1 else next_header + 1
+
+            # blank lines and whitespace after the last base are not part of the record
+            while end > offset and self.map[end - 1] in TRAILING_WHITESPACE:
+                end -= 1
+
+            line_end = self.map.find(b"\n", offset, end)
+            if line_end == -1:
+                bases = end - offset
+                width = bases + 1
+            else:
+                width = line_end + 1 - offset
+                bases = len(self.map[offset:offset + width].rstrip(b"\r\n"))
+            length = end - offset - self.count_line_breaks(offset, end)
+
+            # every line but the last one has to be as long as the first one
+            if bases > 0:
+                line_breaks = offset + bases + np.arange((length - 1) // bases) * width
+                if end - offset != length + (length - 1) // bases * (width - bases) or \
+                        not np.isin(data[line_breaks], (10, 13)).all():
+                    raise FastaFormatException("lines of record {} in {} differ in length".format(
+                        len(self.names) + 1, self.path))
+
+            header_line = self.map[header + 1:offset].split()
+            self.names.append(header_line[0].decode() if header_line else "")
+            lengths.append(length)
+            offsets.append(offset)
+            line_bases.append(bases)
+            line_widths.append(width)
+
+            header = None if next_header == -1 else next_header + 1
+
+        self.lengths = np.array(lengths, dtype=np.int64)
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.line_bases = np.array(line_bases, dtype=np.int64)
+        self.line_widths = np.array(line_widths, dtype=np.int64)
+
+    def load_index(self, index_path):
+        """
+        Parameters
+        ----------
+        index_path : str
+            path to the .fai file
+        """
+        with open(index_path, "r") as index:
+            rows = [line.rstrip("\n").split("\t") for line in index if line.strip()]
+
+        self.names = [row[0] for row in rows]
+        self.lengths, self.offsets, self.line_bases, self.line_widths = \
+            np.array([[int(value) for value in row[1:5]] for row in rows], dtype=np.int64).reshape(-1, 4).T
+
+    def write_index(self, index_path):
+        """
+        Parameters
+        ----------
+        index_path : str
+            path to the .fai file
+        """
+        with open("{}.tmp".format(index_path), "w") as index:
+            for row in zip(self.names, self.lengths, self.offsets, self.line_bases, self.line_widths):
+                index.write("\t".join(str(value) for value in row) + "\n")
+        os.replace("{}.tmp".format(index_path), index_path)
+
+    def position(self, number, base):
+        """
+        Parameters
+        ----------
+        number : int
+            number of the record
+        base : int
+            position of the base in the record
+
+        Returns
+        -------
+        int
+            position of the base in the file
+        """
+        bases = max(self.line_bases[number], 1)
+        return int(self.offsets[number] + base // bases * self.line_widths[number] + base % bases)
+
+    def region(self, number, start=0, end=None):
+        """
+        Parameters
+        ----------
+        number : int
+            number of the record
+        start : int
+            first base of the region
+        end : int
+            base after the region, None for the end of the record
+
+        Returns
+        -------
+        bytes
+            the region as stored in the file, including line breaks
+        """
+        length = int(self.lengths[number])
+        end = length if end is None else min(end, length)
+        start = max(start, 0)
+        if start >= end:
+            return b""
+        return self.map[self.position(number, start):self.position(number, end - 1) + 1]
+
+    def fetch(self, number, start=0, end=None):
+        """
+        Parameters
+        ----------
+        number : int
+            number of the record
+        start : int
+            first base of the sequence
+        end : int
+            base after the sequence, None for the end of the record
+
+        Returns
+        -------
+        str
+            the sequence between start and end
+        """
+        return self.region(number, start, end).translate(None, b"\r\n").decode("ascii")
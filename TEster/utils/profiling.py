@@ -0,0 +1,320 @@
+import asyncio
+import csv
+import json
+import os
+import resource
+import signal
+import subprocess
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# seconds between the checks of a running program that cannot be waited for with a pidfd
+PROCESS_POLL = 0.05
+
+
+class Profiler:
+    """
+    Collects the wall time spent in the stages of the tuning pipeline,
+    the resources used by external programs and counters for every
+    run of the analysis
+    """
+
+    def __init__(self):
+        self.run_number = 1
+        self.reset()
+
+    def reset(self):
+        """
+        Discards everything recorded so far
+        """
+        # stage: [calls, seconds]
+        self.stages = defaultdict(lambda: [0, 0.0])
+        # program: [runs, wall seconds, user seconds, system seconds, max RSS in kB]
+        self.processes = defaultdict(lambda: [0, 0.0, 0.0, 0.0, 0])
+        # run number: counter: amount
+        self.counters = defaultdict(lambda: defaultdict(int))
+
+    @contextmanager
+    def timer(self, stage):
+        """
+        Measures the wall time of the enclosed block
+
+        Parameters
+        ----------
+        stage : str
+            name of the measured stage
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[stage][0] += 1
+            self.stages[stage][1] += time.perf_counter() - start
+
+    def count(self, counter, amount=1):
+        """
+        Increases a counter of the current run
+
+        Parameters
+        ----------
+        counter : str
+            name of the counter
+        amount : int
+            value added to the counter
+        """
+        self.counters[self.run_number][counter] += amount
+
+    def record_process(self, program, wall, usage):
+        """
+        Adds the resources used by a finished program
+
+        Parameters
+        ----------
+        program : str
+            name of the program
+        wall : float
+            wall time of the program in seconds
+        usage : resource.struct_rusage
+            resource usage returned by os.wait4
+        """
+        process = self.processes[program]
+        process[0] += 1
+        process[1] += wall
+        process[2] += usage.ru_utime
+        process[3] += usage.ru_stime
+        process[4] = max(process[4], usage.ru_maxrss)
+
+    def snapshot(self):
+        """
+        Returns
+        -------
+        dict
+            everything recorded so far as plain data, e.g. to be sent
+            from a worker process to the main one
+        """
+        return {"stages": {stage: list(values) for stage, values in self.stages.items()},
+                "processes": {program: list(values) for program, values in self.processes.items()},
+                "counters": {run: dict(counters) for run, counters in self.counters.items()}}
+
+    def merge(self, snapshot):
+        """
+        Adds the records of another profiler
+
+        Parameters
+        ----------
+        snapshot : dict
+            records created by Profiler.snapshot
+        """
+        for stage, (calls, seconds) in snapshot["stages"].items():
+            self.stages[stage][0] += calls
+            self.stages[stage][1] += seconds
+
+        for program, (runs, wall, user, system, max_rss) in snapshot["processes"].items():
+            process = self.processes[program]
+            process[0] += runs
+            process[1] += wall
+            process[2] += user
+            process[3] += system
+            process[4] = max(process[4], max_rss)
+
+        for run, counters in snapshot["counters"].items():
+            for counter, amount in counters.items():
+                self.counters[int(run)][counter] += amount
+
+    def write_report(self, path):
+        """
+        Writes the timing report as JSON, or as CSV if the path ends with .csv
+
+        Parameters
+        ----------
+        path : str
+            path to the report file
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if not path.endswith(".csv"):
+            with open(path, "w") as report:
+                json.dump({"stages": {stage: {"calls": calls, "seconds": seconds}
+                                      for stage, (calls, seconds) in self.stages.items()},
+                           "processes": {program: {"runs": runs, "wall_seconds": wall, "user_seconds": user,
+                                                   "system_seconds": system, "max_rss_kb": max_rss}
+                                         for program, (runs, wall, user, system, max_rss) in self.processes.items()},
+                           "runs": {run: dict(counters) for run, counters in self.counters.items()}},
+                          report, indent=4)
+            return
+
+        with open(path, "w") as report:
+            outcsv = csv.writer(report)
+            outcsv.writerow(("Section", "Name", "Count", "Wall", "User", "System", "Max RSS"))
+            for stage, (calls, seconds) in sorted(self.stages.items()):
+                outcsv.writerow(("stage", stage, calls, round(seconds, 6), "", "", ""))
+            for program, (runs, wall, user, system, max_rss) in sorted(self.processes.items()):
+                outcsv.writerow(("process", program, runs, round(wall, 6), round(user, 6), round(system, 6), max_rss))
+            for run, counters in sorted(self.counters.items()):
+                for counter, amount in sorted(counters.items()):
+                    outcsv.writerow(("run {}".format(run), counter, amount, "", "", "", ""))
+
+
+# profiler of the current process
+profiler = Profiler()
+
+
+def exit_code(status):
+    """
+    Converts a wait status like os.waitstatus_to_exitcode, which needs Python 3.9
+
+    Parameters
+    ----------
+    status : int
+        wait status returned by os.wait4
+
+    Returns
+    -------
+    int
+        return code of the program, negative signal number if it was killed
+    """
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def run_process(args, env=None):
+    """
+    Runs a program like subprocess.run and records its wall time,
+    CPU time and peak memory in the profiler
+
+    Parameters
+    ----------
+    args : list
+        the program and its arguments
+    env : dict
+        environment of the program, None inherits the current one
+
+    Returns
+    -------
+    int
+        return code of the program
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(args, env=env)
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = exit_code(status)
+
+    profiler.record_process(os.path.basename(args[0]), time.perf_counter() - start, usage)
+    return process.returncode
+
+
+def limit_memory(memory_limit):
+    """
+    Parameters
+    ----------
+    memory_limit : int
+        maximum address space of a program in bytes
+
+    Returns
+    -------
+    function
+        sets the limit in the child process before the program starts
+    """
+    def set_limit():
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    return set_limit
+
+
+async def wait_process(pid):
+    """
+    Waits for a program to exit without blocking the event loop and reaps it,
+    watching a pidfd where Linux 5.3 and Python 3.9 provide one and polling
+    os.wait4 elsewhere
+
+    Parameters
+    ----------
+    pid : int
+        process id of the program
+
+    Returns
+    -------
+    int
+        wait status of the program
+    resource.struct_rusage
+        resources used by the program
+    """
+    try:
+        pidfd = os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        while True:
+            reaped, status, usage = os.wait4(pid, os.WNOHANG)
+            if reaped:
+                return status, usage
+            await asyncio.sleep(PROCESS_POLL)
+
+    loop = asyncio.get_running_loop()
+    exited = loop.create_future()
+
+    def on_exit():
+        loop.remove_reader(pidfd)
+        if not exited.done():
+            exited.set_result(None)
+
+    loop.add_reader(pidfd, on_exit)
+    try:
+        await exited
+    finally:
+        loop.remove_reader(pidfd)
+        os.close(pidfd)
+
+    _, status, usage = os.wait4(pid, 0)
+    return status, usage
+
+
+async def run_process_async(args, env=None, timeout=None, memory_limit=None, stop=None):
+    """
+    Runs a program without blocking the event loop and records its
+    resources like run_process. A program exceeding the time limit or
+    told to stop is killed together with the processes it started
+
+    Parameters
+    ----------
+    args : list
+        the program and its arguments
+    env : dict
+        environment of the program, None inherits the current one
+    timeout : float
+        wall time limit in seconds, None for no limit
+    memory_limit : int
+        address space limit in bytes, None for no limit
+    stop : asyncio.Event
+        kills the program once set, None if it is never stopped
+
+    Returns
+    -------
+    int
+        return code of the program or None if it was killed for exceeding
+        the time limit or being stopped
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(args, env=env, start_new_session=True,
+                               preexec_fn=limit_memory(memory_limit) if memory_limit else None)
+
+    # the process is reaped here rather than by asyncio to keep its resource usage
+    exited = asyncio.ensure_future(wait_process(process.pid))
+    stopped = asyncio.ensure_future(stop.wait()) if stop is not None else None
+    try:
+        await asyncio.wait([exited] if stopped is None else [exited, stopped], timeout=timeout,
+                           return_when=asyncio.FIRST_COMPLETED)
+        killed = not exited.done()
+        if killed:
+            os.killpg(process.pid, signal.SIGKILL)
+        status, usage = await exited
+    finally:
+        exited.cancel()
+        if stopped is not None:
+            stopped.cancel()
+
+    process.returncode = exit_code(status)
+
+    profiler.record_process(os.path.basename(args[0]), time.perf_counter() - start, usage)
+    return None if killed else process.returncode
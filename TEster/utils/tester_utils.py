@@ -1,80 +1,268 @@
+import copy
 import csv
+import hashlib
+import os
+import site
+from contextlib import contextmanager
 import ruamel.yaml
 import yaml
-import subprocess
-from numpy import arange
+from numpy import arange, int64
 from nested.config.config import config_path
-from TEster.toolchain.TEster import tool_used
+from TEster.analysis.results_table import RESULT_COLUMNS
+from TEster.utils.profiling import run_process
 
-if tool_used == "ltr_finder":
-    param_defaults = {"o": 3, "t": 1, "e": 0, "m": 2, "u": -2, "D": 20000, 
-                  "d": 1000, "L": 3500, "l": 100, "p": 20, "g": 50, "G": 2,
-                  "T": 4, "S": 6, "M": 0}
-elif tool_used == "ltr_harvest":
-    param_defaults = {"minlenltr": 100, "maxlenltr": 1000, "mindistltr":1000,
-                  "maxdistltr": 15000, "similar": 85, "mintsd": 4, "maxtsd": 20,
-                  "vic": 60, "xdrop": 5, "mat": 2, "mis": -2, "ins": -3, "del": -3} 
-else:
-    pass #TODO raise exception
+# default parameter values of every recognition tool that can be parametrised
+param_defaults = {
+    "ltr_finder": {"o": 3, "t": 1, "e": 0, "m": 2, "u": -2, "D": 20000,
+                   "d": 1000, "L": 3500, "l": 100, "p": 20, "g": 50, "G": 2,
+                   "T": 4, "S": 6, "M": 0},
+    "ltr_harvest": {"minlenltr": 100, "maxlenltr": 1000, "mindistltr": 1000,
+                    "maxdistltr": 15000, "similar": 85, "mintsd": 4, "maxtsd": 20,
+                    "vic": 60, "xdrop": 5, "mat": 2, "mis": -2, "ins": -3, "del": -3},
+}
 
+# wider parameter ranges are represented by at most this many values
+MAX_GRID_POINTS = 2000
 
-def set_config_to_final(good_values, sequence_path, out_dir):
+# parsed installed config.yml, shared by all runs of the session
+_installed_config = None
+
+
+class ConfigIsolationException(Exception):
+    """ Raised if nested-nester cannot be given a private config.yml """
+
+    def __init__(self, message):
+        self.message = message
+
+
+def set_config_to_final(values, sequence_path, out_dir):
     """
-    Detects the best accuracy and writes the parameters that correspond to this
-    accuracy into the config.yml file
+    Writes the chosen configuration into the config.yml file
+    and runs TE-nester with it on the query sequence
 
     Parameters
     ----------
-    good_values : dict
-        dictionary containing parameter values recognized as good
+    values : dict
+        dictionary mapping parameter names to the final values
     sequence_path : str
         path to the query file
     out_dir : str
         path to the output directory
     """
 
-    # finds index of configuration with best result
-    best_position = good_values["Accuracy"].index(max(good_values["Accuracy"]))
-
-    # writes that configuration to config.yml
-    for p_name in param_defaults:
-        edit_config(p_name, good_values[p_name][best_position])
+    # writes the final configuration to config.yml
+    write_global_config(values)
 
     # runs TE-nester
-    subprocess.run(["nested-nester", "-d", out_dir, sequence_path])
+    run_process(["nested-nester", "-d", out_dir, sequence_path])
+
+
+def load_config():
+    """
+    Reads the installed config.yml, parsing it only on the first call
+
+    Returns
+    -------
+    dict
+        a copy of the installed configuration that can be freely edited
+    """
+    global _installed_config
+
+    if _installed_config is None:
+        with open(config_path, "r") as config_file:
+            _installed_config = yaml.safe_load(config_file)
+
+    return copy.deepcopy(_installed_config)
+
+
+def build_config(values):
+    """
+    Builds the full configuration of a single run in memory
+
+    Parameters
+    ----------
+    values : dict
+        dictionary mapping parameter names to the values to assign them
+
+    Returns
+    -------
+    dict
+        the installed configuration with the given parameter values
+    """
+    config = load_config()
+    config['ltr']['args'].update(values)
+    return config
+
+
+def dump_config(config, path):
+    """
+    Writes the configuration into the given file in a single write
+
+    Parameters
+    ----------
+    config : dict
+        configuration created by build_config
+    path : str
+        path of the file to write
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, "w") as output:
+        ruamel.yaml.YAML().dump(config, output)
+
+
+def write_global_config(values):
+    """
+    Writes the given parameter values into the installed config.yml
+
+    Parameters
+    ----------
+    values : dict
+        dictionary mapping parameter names to the values to assign them
+    """
+    global _installed_config
+
+    dump_config(build_config(values), config_path)
+    _installed_config = None
+
+
+def can_isolate_config():
+    """
+    Checks if nested-nester can be given a private config.yml, which is
+    only possible for user-space installations of nested where the config
+    is looked up relative to the home directory
+
+    Returns
+    -------
+    bool
+        True if config.yml is located in the user's home directory
+    """
+    real_home = os.path.expanduser("~")
+    return os.path.commonpath([real_home, os.path.abspath(config_path)]) == real_home
 
 
-def edit_config(parameter, value):
+def require_config_isolation():
     """
-    Edits the config.yml file for the particular parameter to the given value
+    Makes sure nested-nester runs can be given a private config.yml, which
+    concurrent runs need so that they do not overwrite each other's settings
+    """
+    if not can_isolate_config():
+        raise ConfigIsolationException("{} is a system-wide config that concurrent runs cannot each get a copy "
+                                       "of, run with -j 1 or install nested with --user".format(config_path))
+
+
+@contextmanager
+def preserved_config():
+    """
+    Restores the installed config.yml when the block is left, also on errors,
+    for the runs that have to rewrite it with a system-wide installation
+    """
+    global _installed_config
+
+    with open(config_path, "rb") as config_file:
+        original = config_file.read()
+    try:
+        yield
+    finally:
+        with open(config_path, "wb") as config_file:
+            config_file.write(original)
+        _installed_config = None
+
+
+def write_config(values, home_dir):
+    """
+    Writes a private copy of config.yml with all the given parameter values
+    into the home directory of a single nested-nester run, so that concurrent
+    runs do not overwrite each other's settings. A system-wide config cannot
+    be copied, so it is rewritten in place for runs that go one at a time
+    within preserved_config
+
+    Parameters
+    ----------
+    values : dict
+        dictionary mapping parameter names to the values to assign them
+    home_dir : str
+        private home directory the run's nested-nester is started with
+
+    Returns
+    -------
+    str
+        path to the written config file
+    """
+    if not can_isolate_config():
+        dump_config(build_config(values), config_path)
+        return config_path
+
+    real_home = os.path.expanduser("~")
+    run_config_path = os.path.join(home_dir, os.path.relpath(config_path, real_home))
+    dump_config(build_config(values), run_config_path)
+
+    return run_config_path
+
+
+def nester_environment(home_dir):
+    """
+    Creates the environment for a nested-nester run that reads its config.yml
+    from the given private home directory
 
     Parameters
     ----------
-    parameter : str
-        the parameter to change
-    value : int/float
-        the value to assign the parameter
+    home_dir : str
+        private home directory prepared by write_config
+
+    Returns
+    -------
+    dict
+        environment variables for the subprocess, unchanged for a
+        system-wide config that is not read from the home directory
     """
-    yaml_dumper = ruamel.yaml.YAML()
+    env = dict(os.environ)
+    if not can_isolate_config():
+        return env
+    env["HOME"] = home_dir
+    # keeps user-installed python packages importable after moving HOME
+    env["PYTHONUSERBASE"] = site.getuserbase()
+    return env
 
-    with open(config_path, "r") as config_file:
-        config = yaml.safe_load(config_file)
 
-    config['ltr']['args'][parameter] = value
+def reset_config(tool):
+    """
+    Resets the parameters of the recognition tool in config.yml to their default values.
+    TE-nester annotates the database in this process, where the config cannot be moved,
+    so the installed file is rewritten and has to be restored with preserved_config
 
-    with open(config_path, "w") as output:
-        yaml_dumper.dump(config, output)
+    Parameters
+    ----------
+    tool : str
+        recognition tool used by nested-nester
+    """
+    write_global_config(param_defaults[tool])
 
 
-def reset_config():
+def file_hash(path):
     """
-    Resets the parameters of ltr_finder in config.yml to their default values
+    Calculates the SHA-256 digest of a file's content
+
+    Parameters
+    ----------
+    path : str
+        path to the file
+
+    Returns
+    -------
+    str
+        hexadecimal digest of the file
     """
-    for p_name in param_defaults:
-        edit_config(p_name, param_defaults[p_name])
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as hashed_file:
+        for block in iter(lambda: hashed_file.read(1 << 20), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
 
 
-def prepare_csv(file):
+def prepare_csv(file, param_names):
     """
     Opens the csv buffer and writes the first row
 
@@ -82,6 +270,8 @@ def prepare_csv(file):
     ----------
     file : TextIOWrapper
         the csv file wrapper
+    param_names : list
+        names of the parameters being tuned
 
     Returns
     -------
@@ -92,37 +282,78 @@ def prepare_csv(file):
 
     first_row = []
 
-    for p_name in param_defaults:
+    for p_name in param_names:
         first_row.append(p_name)
 
-    first_row.extend(("Accuracy", "False Positives", "False Negatives"))
+    first_row.extend(RESULT_COLUMNS)
     outcsv.writerow(first_row)
 
     return outcsv
 
 
-def add_to_dict(row, dict):
+class ValueGrid:
     """
-    Converts row of parameter values into a dictionary
-
-    Parameters
-    ----------
-    row : list
-        row read from csv file
-    dict : dict
-        dictionary of the parameter:values_list type
+    Evenly spaced values of a parameter described only by the first value,
+    the step and the number of values. The values themselves are created
+    as a numpy array the first time they are needed
     """
-    for p, value in zip(param_defaults, row[:-1]):
-        if p == "M":
-            dict[p].append(round(float(value), 1))
-        else:
-            dict[p].append(int(value))
-    dict["Accuracy"].append(round(float(row[-3]), 3))
 
+    def __init__(self, param_name, start, step, count):
+        """
+        Parameters
+        ----------
+        param_name : str
+            name of the parameter the values belong to
+        start : int/float
+            first value
+        step : int/float
+            difference between neighbouring values
+        count : int
+            number of values
+        """
+        self.param_name = param_name
+        self.start = start
+        self.step = step
+        self.count = count
+        self._array = None
+
+    @property
+    def array(self):
+        """
+        Returns
+        -------
+        numpy.ndarray
+            all the values of the grid
+        """
+        if self._array is None:
+            if self.param_name == "M":
+                self._array = (self.start + self.step * arange(self.count)).round(1)
+            else:
+                self._array = self.start + self.step * arange(self.count, dtype=int64)
+        return self._array
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.array)
 
-def create_values_list(param_name, min, max):
+    def __getitem__(self, index):
+        return self.array[index]
+
+    def __array__(self, dtype=None, copy=None):
+        return self.array if dtype is None else self.array.astype(dtype)
+
+    def __getstate__(self):
+        # the materialized values are not saved with checkpoints
+        state = dict(self.__dict__)
+        state["_array"] = None
+        return state
+
+
+def create_values_list(param_name, min, max, max_points=MAX_GRID_POINTS):
     """
-    Creates list based on max and min value and the corresponding parameter
+    Creates the grid of values based on max and min value and the corresponding parameter
 
     Parameters
     ----------
@@ -132,16 +363,22 @@ def create_values_list(param_name, min, max):
         minimum value to be contained in the list
     max : int/float
         maximum value to be contained in the list
+    max_points : int
+        wider ranges are coarsened to at most this many values,
+        None keeps every value
 
     Returns
     -------
-    the created list
+    ValueGrid
+        the created grid
     """
     if min == max:
-        return [min]
+        return ValueGrid(param_name, min, 1, 1)
     if param_name == "M":
-        return ([i for i in arange(min, max+0.1, 0.1)])
-    elif max > 100000:
-        return ([i for i in range(min, max+1, 10)])
-    else:
-        return ([i for i in range(min, max+1)])
+        return ValueGrid(param_name, min, 0.1, int(round((max - min) / 0.1)) + 1)
+
+    step = 10 if max > 100000 else 1
+    if max_points is not None and (max - min) // step + 1 > max_points:
+        step = -(-(max - min) // (max_points - 1))
+
+    return ValueGrid(param_name, min, step, int((max - min) // step) + 1)
@@ -0,0 +1,250 @@
+"""
+Benchmarks of the scoring and sampling hot paths of TEster.
+
+Runs offline with the stand-in nested package and nested-nester executable
+from benchmarks/stubs, so neither TE-greedy-nester nor its tools are needed.
+
+    python benchmarks/run_benchmarks.py -o results.json
+    python benchmarks/run_benchmarks.py -o new.json --compare results.json
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS_PATH = os.path.dirname(os.path.abspath(__file__))
+STUBS_PATH = os.path.join(BENCHMARKS_PATH, "stubs")
+
+# the stand-in nested reads config.yml from the home directory like a user installation,
+# the directory is removed at exit also when the module is only imported
+HOME = tempfile.TemporaryDirectory(prefix="TEster_bench_")
+HOME_PATH = HOME.name
+os.environ["HOME"] = HOME_PATH
+os.environ["PATH"] = "{}{}{}".format(os.path.join(STUBS_PATH, "bin"), os.pathsep, os.environ["PATH"])
+sys.path[:0] = [os.path.dirname(BENCHMARKS_PATH), STUBS_PATH, BENCHMARKS_PATH]
+
+from synthetic import gff_pair, write_generated_set  # noqa: E402
+
+SCALES = (100, 1000, 10000, 100000)
+
+# recognition tool whose parameters are benchmarked
+TOOL = "ltr_finder"
+
+
+def write_base_config():
+    """
+    Writes the config.yml the stand-in nested reads
+    """
+    from TEster.utils import tester_utils
+
+    os.makedirs(os.path.dirname(tester_utils.config_path), exist_ok=True)
+    with open(tester_utils.config_path, "w") as config:
+        config.write("ltr:\n  path: ltr_finder\n  args:\n")
+        for name, value in tester_utils.param_defaults[TOOL].items():
+            config.write("    {}: {}\n".format(name, value))
+
+
+def measure(function, repeats):
+    """
+    Parameters
+    ----------
+    function : function
+        the benchmarked code
+    repeats : int
+        number of measurements
+
+    Returns
+    -------
+    dict
+        best and mean wall time in seconds
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {"best": min(times), "mean": sum(times) / len(times), "repeats": repeats}
+
+
+def bench_get_accuracy(scale, repeats):
+    from TEster.analysis.gff_parser import get_accuracy
+
+    generated, detected = gff_pair(scale)
+    return measure(lambda: get_accuracy(io.StringIO(generated), io.StringIO(detected)), repeats)
+
+
+def bench_calculate_kde(scale, repeats):
+    from TEster.parametrization.parameter import LtrFinderParameter
+    from synthetic import generated_elements
+
+    values = [start % 30000 + 5000 for start, _ in generated_elements(scale)]
+    accuracies = [(value % 97) / 97 for value in values]
+    parameter = LtrFinderParameter("D")
+    return measure(lambda: parameter.calculate_kde(values, accuracies), repeats)
+
+
+def bench_choose_value(scale, repeats):
+    from TEster.parametrization.parameter import LtrFinderParameter
+
+    parameter = LtrFinderParameter("D")
+    return measure(lambda: [parameter.choose_value() for _ in range(scale)], repeats)
+
+
+def bench_sample_batch(scale, repeats):
+    from TEster.parametrization.parameter import LtrFinderParameter
+    from TEster.parametrization.sampler import BatchSampler
+    from TEster.utils import tester_utils
+
+    sampler = BatchSampler([LtrFinderParameter(name) for name in tester_utils.param_defaults[TOOL]])
+    return measure(lambda: sampler.sample_configurations(scale), repeats)
+
+
+def bench_create_values_list(scale, repeats):
+    from TEster.utils.tester_utils import create_values_list
+
+    return measure(lambda: [len(create_values_list("D", 5000, 5000 + scale)) for _ in range(100)], repeats)
+
+
+def results_table(scale):
+    """
+    Fills a table with configurations sampled from the initial distributions
+
+    Parameters
+    ----------
+    scale : int
+        number of rows
+
+    Returns
+    -------
+    ResultsTable
+        the table
+    """
+    from TEster.analysis.results_table import ResultsTable
+    from TEster.parametrization.parameter import LtrFinderParameter
+    from TEster.utils import tester_utils
+
+    parameters = [LtrFinderParameter(name) for name in tester_utils.param_defaults[TOOL]]
+    results = ResultsTable(tester_utils.param_defaults[TOOL])
+    for row in range(scale):
+        results.append({param.name: param.choose_value() for param in parameters}, (row % 100) / 100, row % 7, row % 5)
+    return results
+
+
+def bench_split_gb_results(scale, repeats):
+    from TEster.parametrization.parameter_tester import split_gb_results
+
+    results = results_table(scale)
+    return measure(lambda: split_gb_results(results, 0.5), repeats)
+
+
+def bench_parameter_sensitivity(scale, repeats):
+    from TEster.analysis.sensitivity import parameter_sensitivity
+
+    good, bad = results_table(scale).split(0.5)
+    return measure(lambda: parameter_sensitivity(good, bad), repeats)
+
+
+def bench_run_analysis(scale, repeats):
+    from TEster.parametrization.parameter_tester import run_analysis
+
+    generated_path = write_generated_set(os.path.join(HOME_PATH, "generated_{}".format(scale)), 1, scale)
+
+    def run():
+        out_dir = tempfile.mkdtemp(dir=HOME_PATH)
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_analysis(generated_path, 20, None, out_dir, jobs=2, strategy="tpe", seed=1, tool=TOOL)
+
+    return measure(run, repeats)
+
+
+BENCHMARKS = {
+    "get_accuracy": (bench_get_accuracy, SCALES),
+    "calculate_kde": (bench_calculate_kde, (100, 1000, 10000)),
+    "choose_value": (bench_choose_value, (100, 1000, 10000)),
+    "sample_batch": (bench_sample_batch, (100, 1000, 10000)),
+    "create_values_list": (bench_create_values_list, (1000, 30000, 135000)),
+    "split_gb_results": (bench_split_gb_results, (200, 2000, 20000)),
+    "parameter_sensitivity": (bench_parameter_sensitivity, (200, 2000, 20000)),
+    "run_analysis": (bench_run_analysis, (100, 1000)),
+}
+
+
+def git_revision():
+    """
+    Returns
+    -------
+    str
+        commit of the benchmarked tree or None outside of a git repository
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BENCHMARKS_PATH, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, previous_path):
+    """
+    Prints the ratio of the best times to the ones of a previous report
+
+    Parameters
+    ----------
+    results : list
+        results of the current benchmarks
+    previous_path : str
+        path to the previous JSON report
+    """
+    with open(previous_path, "r") as previous_file:
+        previous = {(result["benchmark"], result["scale"]): result["best"]
+                    for result in json.load(previous_file)["results"]}
+
+    writer = csv.writer(sys.stdout, delimiter="\t")
+    writer.writerow(("benchmark", "scale", "previous", "current", "ratio"))
+    for result in results:
+        before = previous.get((result["benchmark"], result["scale"]))
+        if before:
+            writer.writerow((result["benchmark"], result["scale"], "{:.6f}".format(before),
+                             "{:.6f}".format(result["best"]), "{:.2f}".format(result["best"] / before)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="path to the JSON report")
+    parser.add_argument("-r", "--repeats", type=int, default=3, help="measurements of every benchmark")
+    parser.add_argument("-b", "--benchmark", action="append", choices=sorted(BENCHMARKS),
+                        help="benchmark to run, may be repeated, all by default")
+    parser.add_argument("--compare", help="previous JSON report to compare the results with")
+    args = parser.parse_args()
+
+    try:
+        write_base_config()
+
+        results = []
+        for name in args.benchmark or BENCHMARKS:
+            function, scales = BENCHMARKS[name]
+            for scale in scales:
+                result = dict(benchmark=name, scale=scale, **function(scale, args.repeats))
+                print("{:<22} {:>7} {:>12.6f} s".format(name, scale, result["best"]))
+                results.append(result)
+
+        with open(args.output, "w") as output:
+            json.dump({"revision": git_revision(),
+                       "python": platform.python_version(),
+                       "machine": platform.machine(),
+                       "results": results}, output, indent=4)
+    finally:
+        HOME.cleanup()
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
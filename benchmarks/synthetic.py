@@ -0,0 +1,155 @@
+"""
+Synthetic fixtures for the benchmarks: GFF3 pairs of generated and detected
+elements and test sets in the layout of nested-generator
+"""
+import os
+import random
+
+# LTR_finder defaults the stub nested-nester treats as the optimal configuration
+OPTIMUM = {"D": 20000, "L": 3500, "p": 20, "M": 0.2}
+
+
+def generated_elements(count, seed=0):
+    """
+    Creates non-overlapping te_base intervals
+
+    Parameters
+    ----------
+    count : int
+        number of elements
+    seed : int
+        seed of the random generator
+
+    Returns
+    -------
+    list
+        (start, end) tuples sorted by start
+    """
+    rng = random.Random(seed)
+    elements = []
+    position = 1
+    for _ in range(count):
+        position += rng.randint(100, 2000)
+        length = rng.randint(1000, 12000)
+        elements.append((position, position + length))
+        position += length
+    return elements
+
+
+def detected_elements(elements, sensitivity=0.8, false_rate=0.1, seed=0):
+    """
+    Simulates the output of a recognition tool on the generated elements
+
+    Parameters
+    ----------
+    elements : list
+        (start, end) tuples of the generated elements
+    sensitivity : float
+        probability that an element is found
+    false_rate : float
+        number of false detections relative to the number of elements
+    seed : int
+        seed of the random generator
+
+    Returns
+    -------
+    list
+        (start, end) tuples of the detected elements
+    """
+    rng = random.Random(seed)
+    detected = []
+    for start, end in elements:
+        if rng.random() < sensitivity:
+            jitter = int((end - start) * 0.05)
+            detected.append((start + rng.randint(-jitter, jitter), end + rng.randint(-jitter, jitter)))
+
+    last = elements[-1][1] if elements else 10000
+    for _ in range(int(len(elements) * false_rate)):
+        start = rng.randint(1, last)
+        detected.append((start, start + rng.randint(1000, 12000)))
+
+    return sorted(detected)
+
+
+def gff_text(elements, feature, sequence_id="GENERATED_1"):
+    """
+    Formats the intervals as a GFF3 file
+
+    Parameters
+    ----------
+    elements : list
+        (start, end) tuples
+    feature : str
+        te_base or nested_repeat
+    sequence_id : str
+        id of the annotated sequence
+
+    Returns
+    -------
+    str
+        content of the GFF3 file
+    """
+    lines = ["##gff-version 3\n"]
+    for number, (start, end) in enumerate(elements):
+        lines.append("{}\tsynthetic\t{}\t{}\t{}\t.\t+\t.\tID=TE_{}\n".format(sequence_id, feature, start, end, number))
+    return "".join(lines)
+
+
+def gff_pair(count, seed=0):
+    """
+    Creates a generated/detected GFF3 pair
+
+    Parameters
+    ----------
+    count : int
+        number of generated elements
+    seed : int
+        seed of the random generator
+
+    Returns
+    -------
+    str
+        GFF3 of the generated te_base elements
+    str
+        GFF3 of the detected nested_repeat elements
+    """
+    elements = generated_elements(count, seed)
+    return gff_text(elements, "te_base"), gff_text(detected_elements(elements, seed=seed), "nested_repeat")
+
+
+def write_generated_set(path, sequences, count, seed=0):
+    """
+    Writes a test set of generated sequences with their ground truth
+
+    Parameters
+    ----------
+    path : str
+        directory of the test set
+    sequences : int
+        number of sequences
+    count : int
+        number of elements in every sequence
+    seed : int
+        seed of the random generator
+
+    Returns
+    -------
+    str
+        path to the test set with a trailing slash
+    """
+    rng = random.Random(seed)
+    for number in range(1, sequences + 1):
+        elements = generated_elements(count, seed + number)
+        sequence_path = os.path.join(path, "sequence_{}".format(number), "generated_data")
+        os.makedirs(os.path.join(sequence_path, "data", "GENERATED_1"), exist_ok=True)
+
+        length = elements[-1][1] + 1000
+        with open(os.path.join(sequence_path, "TEster_generated.fa"), "w") as fasta:
+            fasta.write(">GENERATED_1\n")
+            for _ in range(0, length, 60):
+                fasta.write("".join(rng.choices("ACGT", k=60)) + "\n")
+
+        with open(os.path.join(sequence_path, "data", "GENERATED_1", "GENERATED_1.gff"), "w") as gff:
+            gff.write(gff_text(elements, "te_base"))
+
+    return "{}/".format(path.rstrip("/"))
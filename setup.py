@@ -13,13 +13,13 @@ setup(
         'networkx>=2.1',
         'PyYAML>=3.12',
         'ruamel.yaml>=0.16.10',
-        'pyfastx>=0.6.6',
         'numpy>=1.17',
         'scipy>=1.4.1'
     ],
     entry_points={
         'console_scripts': [
-            'TEster = TEster.toolchain.TEster:main'
+            'TEster = TEster.toolchain.TEster:main',
+            'TEster-worker = TEster.toolchain.TEster_worker:main'
         ]
     }
 )
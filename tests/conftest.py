@@ -0,0 +1,11 @@
+import os
+import sys
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_PATH)
+
+# without TE-greedy-nester installed the stand-in nested package of the benchmarks is imported
+try:
+    import nested.config.config  # noqa: F401
+except ImportError:
+    sys.path.insert(1, os.path.join(ROOT_PATH, "benchmarks", "stubs"))
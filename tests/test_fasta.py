@@ -0,0 +1,60 @@
+import pytest
+from TEster.utils.fasta import IndexedFasta, FastaFormatException
+
+
+def write_fasta(tmp_path, content):
+    path = tmp_path / "records.fa"
+    path.write_bytes(content)
+    return str(path)
+
+
+def records(path):
+    with IndexedFasta(path) as fasta:
+        return [(fasta.names[number], fasta.fetch(number)) for number in range(len(fasta))]
+
+
+def test_trailing_blank_lines_are_not_part_of_the_record(tmp_path):
+    path = write_fasta(tmp_path, b">a\nACGTACGT\nACGT\n\n>b\nTTGG\n \t\n\n")
+
+    assert records(path) == [("a", "ACGTACGTACGT"), ("b", "TTGG")]
+
+
+def test_crlf_line_breaks(tmp_path):
+    path = write_fasta(tmp_path, b">a first\r\nACGT\r\nAC\r\n>b\r\nGGCC\r\nTTAA\r\n\r\n")
+
+    assert records(path) == [("a", "ACGTAC"), ("b", "GGCCTTAA")]
+    with IndexedFasta(path) as fasta:
+        assert fasta.region(1, 2, 6) == b"CC\r\nTT"
+
+
+def test_ragged_last_line_without_line_break(tmp_path):
+    path = write_fasta(tmp_path, b">a\nACG\nTAC\nG")
+
+    with IndexedFasta(path) as fasta:
+        assert fasta.fetch(0) == "ACGTACG"
+        assert fasta.fetch(0, 2, 5) == "GTA"
+        assert list(fasta.lengths) == [7]
+
+
+def test_index_is_reused(tmp_path):
+    path = write_fasta(tmp_path, b">a\nACGTACGT\nACGT\n\n>b\nTT\n")
+    built = records(path)
+
+    assert (tmp_path / "records.fa.fai").exists()
+    assert records(path) == built
+
+
+def test_empty_file_has_no_records(tmp_path):
+    path = write_fasta(tmp_path, b"")
+
+    with IndexedFasta(path) as fasta:
+        assert len(fasta) == 0
+
+
+def test_lines_of_different_length_are_refused(tmp_path):
+    path = write_fasta(tmp_path, b">a\nACGT\nAC\nACGT\n")
+
+    with pytest.raises(FastaFormatException) as error:
+        IndexedFasta(path)
+
+    assert "record 1" in error.value.message
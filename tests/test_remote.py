@@ -0,0 +1,135 @@
+import json
+import socket
+import threading
+import time
+import pytest
+import TEster.parametrization.remote as remote
+from TEster.parametrization.remote import RemoteExecutor, RemoteExecutionException, serve_worker
+from TEster.utils.profiling import Profiler
+
+SEQUENCE_PATH = "/tmp/TEster/generated_data/sequence_0/"
+
+
+class FakeEvaluation:
+    """
+    Stands in for profiled_evaluation so the workers run without nested-nester.
+    A configuration {"n": n} scores n / 100, runs of the configurations in
+    failing raise on their first attempts and the ones in stalling block on
+    their first attempt until released
+    """
+
+    def __init__(self, failing=None, stalling=(), delay=0.0):
+        self.failing = dict(failing or {})
+        self.stalling = set(stalling)
+        self.delay = delay
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+        self.attempts = {}
+        self.limits = []
+
+    def __call__(self, task, run_number=None, timeout=None, memory_limit=None, stop_below=None):
+        n = task[0]["n"]
+        with self.lock:
+            self.attempts[n] = self.attempts.get(n, 0) + 1
+            attempt = self.attempts[n]
+            self.limits.append((timeout, memory_limit))
+
+        if attempt <= self.failing.get(n, 0):
+            raise RuntimeError("nested-nester failed on {}".format(n))
+        if n in self.stalling and attempt == 1:
+            self.release.wait(30)
+        time.sleep(self.delay * (n % 3))
+        return (n, 0, 0, n / 100, False), Profiler().snapshot()
+
+
+@pytest.fixture
+def evaluation(monkeypatch):
+    def install(**kwargs):
+        fake = FakeEvaluation(**kwargs)
+        monkeypatch.setattr(remote, "profiled_evaluation", fake)
+        monkeypatch.setattr(remote.tester_utils, "require_config_isolation", lambda: None)
+        return fake
+    return install
+
+
+def start_workers(executor, count, **kwargs):
+    workers = [threading.Thread(target=serve_worker, args=(executor.address,), kwargs=kwargs, daemon=True)
+               for _ in range(count)]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+def tasks(count):
+    return [({"n": n}, SEQUENCE_PATH, "ltr_finder") for n in range(count)]
+
+
+def test_results_keep_the_order_of_the_tasks(evaluation):
+    fake = evaluation(delay=0.01)
+    with RemoteExecutor(("127.0.0.1", 0), timeout=60, memory_limit=2 ** 30) as executor:
+        workers = start_workers(executor, 3, timeout=5)
+        first = executor.run(tasks(12))
+        second = executor.run(tasks(5))
+
+    for worker in workers:
+        worker.join(5)
+        assert not worker.is_alive()
+    assert first == [(n, 0, 0, n / 100, False) for n in range(12)]
+    assert second == [(n, 0, 0, n / 100, False) for n in range(5)]
+    # the limits of the driver take precedence over the ones of the workers
+    assert set(fake.limits) == {(60, 2 ** 30)}
+
+
+def test_failed_tasks_are_retried(evaluation):
+    fake = evaluation(failing={2: 1, 5: 2})
+    with RemoteExecutor(("127.0.0.1", 0), retries=2) as executor:
+        start_workers(executor, 2)
+        results = executor.run(tasks(6))
+
+    assert results == [(n, 0, 0, n / 100, False) for n in range(6)]
+    assert fake.attempts[2] == 2
+    assert fake.attempts[5] == 3
+
+
+def test_batch_fails_after_the_retries(evaluation):
+    evaluation(failing={1: 3})
+    with RemoteExecutor(("127.0.0.1", 0), retries=2) as executor:
+        start_workers(executor, 2)
+        with pytest.raises(RemoteExecutionException) as error:
+            executor.run(tasks(3))
+
+    assert "nested-nester failed on 1" in error.value.message
+
+
+def test_tasks_of_a_lost_worker_are_retried(evaluation):
+    evaluation()
+    with RemoteExecutor(("127.0.0.1", 0)) as executor:
+        results = []
+        batch = threading.Thread(target=lambda: results.extend(executor.run(tasks(4))))
+        # takes a task and disconnects without replying
+        with socket.create_connection(executor.address) as connection, connection.makefile("rw") as stream:
+            batch.start()
+            taken = json.loads(stream.readline())
+        start_workers(executor, 1)
+        batch.join(10)
+
+    assert taken["values"]["n"] in range(4)
+    assert results == [(n, 0, 0, n / 100, False) for n in range(4)]
+
+
+def test_stragglers_are_started_again_on_idle_workers(evaluation, monkeypatch):
+    monkeypatch.setattr(remote, "STRAGGLER_POLL", 0.05)
+    fake = evaluation(stalling={0}, delay=0.01)
+    with RemoteExecutor(("127.0.0.1", 0), straggler_factor=3.0) as executor:
+        workers = start_workers(executor, 2)
+        start = time.monotonic()
+        results = executor.run(tasks(8))
+        elapsed = time.monotonic() - start
+        fake.release.set()
+
+    for worker in workers:
+        worker.join(5)
+        assert not worker.is_alive()
+    assert results == [(n, 0, 0, n / 100, False) for n in range(8)]
+    assert fake.attempts[0] == 2
+    assert elapsed < 10